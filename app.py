@@ -14,6 +14,7 @@ from google import genai
 from google.genai import types
 import xml.etree.ElementTree as ET
 import inspect
+from id_allocator import IdAllocator, seed_counters
 
 
 def load_schema(xml_file="schema.xml"):
@@ -67,6 +68,8 @@ users_collection = db.get_collection("users")
 listings_collection = db.get_collection("listings")
 requests_collection = db.get_collection("requests")
 notifications_collection = db.get_collection("notifications")
+counters_collection = db.get_collection("counters")
+id_allocator = IdAllocator(counters_collection)
 
 NEO4J_URI = "bolt://localhost:7687"
 NEO4J_USER = "neo4j"
@@ -90,6 +93,11 @@ app.add_middleware(
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+@app.on_event("startup")
+async def seed_id_counters():
+    # Make sure the id counters never fall behind ids that already exist
+    await seed_counters(db, ["users", "listings", "requests"])
+
 # ---------------------
 # Utility Functions
 # ---------------------
@@ -280,7 +288,7 @@ async def register(user: UserModel):
     if await get_user_by_email(user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
     user.password = hash_password(user.password)
-    user.id = str(await users_collection.count_documents({}) + 1)
+    user.id = await id_allocator.next_id("users")
     user.created_at = datetime.now(timezone.utc)
     validate_mongo_data('users', user.dict())
     await users_collection.insert_one(user.dict())
@@ -321,7 +329,7 @@ async def create_listing(listing: ListingModel, current_user: Dict = Depends(get
         raise HTTPException(status_code=403, detail="Only supermarkets can create listings")
 
     listing_dict = listing.dict()
-    listing_dict["id"] = str(await listings_collection.count_documents({}) + 1)
+    listing_dict["id"] = await id_allocator.next_id("listings")
     listing_dict["created_at"] = datetime.now(timezone.utc)
 
     # Validate data against XML schema
@@ -369,7 +377,7 @@ async def delete_listing(listing_id: str, current_user: Dict = Depends(get_curre
 @app.post("/api/requests", response_model=Dict[str, Any])
 async def create_request(req: RequestCreate, current_user: Dict = Depends(get_current_user)):
     new_request = {
-        "id": str(await requests_collection.count_documents({}) + 1),
+        "id": await id_allocator.next_id("requests"),
         "listing_id": req.listing_id,
         "requester_id": current_user["id"],
         "location": current_user["location"],
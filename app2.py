@@ -1,19 +1,45 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Request
+from fastapi import FastAPI, HTTPException, Depends, status, Request, Response, UploadFile, File, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional, Any, Dict
 from datetime import datetime, timedelta, timezone
 import motor.motor_asyncio
-import bcrypt
 from jose import jwt
 import uvicorn
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase
+from contextlib import asynccontextmanager
 import os
-from google import genai
-from google.genai import types
 import xml.etree.ElementTree as ET
-import inspect
+from id_allocator import IdAllocator, seed_counters
+from schema_validators import compile_schema
+from schema_cache import load_schema_snapshot, SchemaWatcher
+from index_bootstrap import load_index_plan, ensure_mongo_indexes, ensure_neo4j_constraints, mongo_index_stats, neo4j_index_stats
+import asyncio
+from password_hashing import hasher_from_env, PasswordQueueFull
+from city_graph import CityGraph
+from llm_client import LLMClient, LLMError, LLMTimeout
+from llm_cache import LLMResponseCache, make_key as make_cache_key
+from pagination import fetch_page
+from request_owners import backfill_request_owners
+from stats_store import StatsStore, user_delta, listing_delta, request_delta, change_delta, merge_deltas
+from listing_import import detect_format, iter_rows, import_listings
+from city_import import import_cities, import_edges
+from read_models import model_projection, dump_rows, json_response, find_many, find_one
+from entity_cache import EntityCache
+from token_revocations import TokenRevocations
+from listing_lifecycle import ListingArchiver
+from urgency_queue import UrgencyQueue, URGENT_AUTO_MATCH
+from pymongo import ReturnDocument
+from collection_export import export_cursor, stream_ndjson, stream_csv
+from pymongo import ASCENDING, DESCENDING
+from matching_jobs import MatchingJobQueue, JobQueueFull, JOB_STATUSES
+from matching import (
+    rank_candidates, candidate_line, build_prompt, deterministic_result, parse_llm_output,
+    build_batch_prompts, split_batch_output, LLM_MAX_OUTPUT_TOKENS, LLM_TEMPERATURE,
+    MATCHING_BATCH_OUTPUT_TOKENS_PER_LISTING,
+)
 import json
 import lxml.etree as etree
 
@@ -21,7 +47,7 @@ from lxml import etree
 
 def validate_xml(xml_path="schema.xml", xsd_path="inventory_schema.xsd"):
     """
-    Validate an XML file against an XSD schema.
+    Validate an XML file against an XSD schema. Returns True only if it validates.
     """
     try:
         xmlschema_doc = etree.parse(xsd_path)
@@ -33,7 +59,7 @@ def validate_xml(xml_path="schema.xml", xsd_path="inventory_schema.xsd"):
         if not result:
             print(f"XML validation error in '{xml_path}': {xmlschema.error_log}")
 
-        return "[DEBUG] XML validation passed!" if result else "[DEBUG] XML validation failed!"
+        return bool(result)
     except etree.XMLSchemaParseError as e:
         print(f"Error parsing XSD '{xsd_path}': {str(e)}")
         return False
@@ -47,14 +73,17 @@ def validate_xml(xml_path="schema.xml", xsd_path="inventory_schema.xsd"):
         print(f"Error during XML validation: {str(e)}")
         return False
 
-def load_schema(xsd_file="inventory_schema.xsd"):
+def load_schema(xsd_file="inventory_schema.xsd", xml_file="schema.xml"):
     """Load database schema from XSD file."""
-    print("[DEBUG] Loading schema from inventory_schema.xsd...")
+    print(f"[DEBUG] Loading schema from {xsd_file}...")
 
     # Parse XSD file
     tree = ET.parse(xsd_file)
     root = tree.getroot()
 
+    # Parse schema.xml once for both the MongoDB and Neo4j sections
+    xml_root = ET.parse(xml_file).getroot()
+
     # Get XML namespace for easier querying
     ns = {'xs': 'http://www.w3.org/2001/XMLSchema'}
 
@@ -67,9 +96,6 @@ def load_schema(xsd_file="inventory_schema.xsd"):
     if mongodb_elem_xsd is not None:
         print("[DEBUG] Found MongoDB element in XSD")
 
-        # Parse the XML file to get MongoDB structure
-        xml_tree = ET.parse("schema.xml")
-        xml_root = xml_tree.getroot()
         mongodb_elem_xml = xml_root.find('./MongoDB')
         if mongodb_elem_xml is not None:
             print("[DEBUG] Found MongoDB element in schema.xml")
@@ -99,8 +125,6 @@ def load_schema(xsd_file="inventory_schema.xsd"):
         print("[DEBUG] Found Neo4j element")
 
         # Get Neo4j databases from XML
-        xml_tree = ET.parse("schema.xml")
-        xml_root = xml_tree.getroot()
         neo4j_dbs = xml_root.findall('.//Neo4j/Database')
 
         for db in neo4j_dbs:
@@ -143,11 +167,42 @@ def load_schema(xsd_file="inventory_schema.xsd"):
     print("[DEBUG] Loaded schema:")
     print(json.dumps(schema, indent=4))
     return schema
-    
-# Load schema at startup
-print(validate_xml())
-DATABASE_SCHEMA = load_schema()
+
+def build_schema(xml_path="schema.xml", xsd_path="inventory_schema.xsd"):
+    """
+    Validate schema.xml against the XSD and load it (result is cached by schema_cache).
+    Raises ValueError if validation fails, so nothing is cached and a running
+    watcher keeps the previous schema.
+    """
+    if not validate_xml(xml_path, xsd_path):
+        raise ValueError(f"'{xml_path}' does not validate against '{xsd_path}'")
+    return load_schema(xsd_path, xml_path)
+
+SCHEMA_XML_PATH = "schema.xml"
+SCHEMA_XSD_PATH = "inventory_schema.xsd"
+
+# Load schema at startup, reusing the cached snapshot when both files are unchanged
+DATABASE_SCHEMA = load_schema_snapshot(SCHEMA_XML_PATH, SCHEMA_XSD_PATH, build_schema)
 print("[DEBUG] Loaded schema:", DATABASE_SCHEMA)
+# Compile validators once so writes do not walk the schema dict per field
+COMPILED_SCHEMA = compile_schema(DATABASE_SCHEMA)
+
+def apply_schema(schema):
+    """Swap in a new schema; validators are compiled before either global changes."""
+    global DATABASE_SCHEMA, COMPILED_SCHEMA
+    compiled = compile_schema(schema)
+    DATABASE_SCHEMA, COMPILED_SCHEMA = schema, compiled
+
+# Opt-in hot reload of schema.xml (SCHEMA_HOT_RELOAD=1)
+schema_watcher = None
+if os.environ.get("SCHEMA_HOT_RELOAD") == "1":
+    schema_watcher = SchemaWatcher(
+        SCHEMA_XML_PATH,
+        SCHEMA_XSD_PATH,
+        build_schema,
+        apply_schema,
+        interval=float(os.environ.get("SCHEMA_WATCH_INTERVAL", "2")),
+    )
 
 # ---------------------
 # Configuration & Setup
@@ -160,17 +215,113 @@ users_collection = db.get_collection("users")
 listings_collection = db.get_collection("listings")
 requests_collection = db.get_collection("requests")
 notifications_collection = db.get_collection("notifications")
+counters_collection = db.get_collection("counters")
+matching_jobs_collection = db.get_collection("matching_jobs")
+id_allocator = IdAllocator(counters_collection)
+# Dashboard counters, kept up to date by the write routes and reconciled in the background
+stats_store = StatsStore(db)
+
+async def load_user(user_id: str) -> Optional[Dict]:
+    return await users_collection.find_one({"id": user_id}, {"_id": 0})
+
+async def load_listing(listing_id: str) -> Optional[Dict]:
+    return await listings_collection.find_one({"id": listing_id}, {"_id": 0})
+
+# Hot users and listings by id; every write to one of them must invalidate it
+user_cache = EntityCache("users", load_user)
+listing_cache = EntityCache("listings", load_listing)
+
+# Unmatched listings by soonest expiry; kept current by the listing routes and reloaded periodically
+urgency_queue = UrgencyQueue()
+
+async def on_listings_archived(docs: List[Dict], requests_declined: int):
+    for doc in docs:
+        listing_cache.invalidate(doc["id"])
+        urgency_queue.remove(doc["id"])
+        await llm_cache.invalidate_listing(doc["id"])
+    delta = merge_deltas([listing_delta(doc, -1) for doc in docs] + [{
+        "requests.by_status.pending": -requests_declined,
+        "requests.by_status.declined": requests_declined,
+    }])
+    await stats_store.record(delta)
+
+# Expired listings are moved to listings_archive on a schedule
+listing_archiver = ListingArchiver(
+    listings_collection,
+    db.get_collection("listings_archive"),
+    requests_collection,
+    on_archived=on_listings_archived,
+)
 
 NEO4J_URI = "bolt://localhost:7687"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "hydridhydrid"
-neo4j_driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+NEO4J_MAX_POOL_SIZE = int(os.environ.get("NEO4J_MAX_POOL_SIZE", "50"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.environ.get("NEO4J_ACQUISITION_TIMEOUT", "30"))
+# Created and closed by the lifespan hook below
+neo4j_driver = None
+
+# In-memory mirror of City/NEIGHBOR_OF, loaded at startup and checked against Neo4j periodically
+city_graph = CityGraph()
+CITY_GRAPH_CHECK_INTERVAL = float(os.environ.get("CITY_GRAPH_CHECK_INTERVAL", "300"))
+
+# Matching LLM responses, keyed by prompt hash and model config
+llm_cache = LLMResponseCache()
+
+def create_neo4j_driver():
+    return AsyncGraphDatabase.driver(
+        NEO4J_URI,
+        auth=(NEO4J_USER, NEO4J_PASSWORD),
+        max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+        connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT,
+    )
 
 SECRET_KEY = "your_secret_key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
-
-app = FastAPI()
+# Users whose older tokens must be rejected; refreshed from Mongo in the background
+token_revocations = TokenRevocations(db.get_collection("token_revocations"), timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global neo4j_driver
+    neo4j_driver = create_neo4j_driver()
+    await seed_id_counters()
+    await bootstrap_indexes()
+    await backfill_request_owners(db)
+    queued = await urgency_queue.rebuild(listings_collection, requests_collection)
+    print(f"[DEBUG] Urgency queue loaded: {queued} unmatched listings")
+    await calibrate_password_hashing()
+    await city_graph.load(neo4j_driver)
+    graph_check_task = asyncio.create_task(
+        city_graph.run_consistency_checks(neo4j_driver, CITY_GRAPH_CHECK_INTERVAL, on_reload=llm_cache.invalidate_locations)
+    )
+    await matching_jobs.start()
+    stats_task = asyncio.create_task(stats_store.run_reconciliation())
+    revocations_task = asyncio.create_task(token_revocations.run_refresh())
+    archiver_task = asyncio.create_task(listing_archiver.run())
+    urgency_task = asyncio.create_task(urgency_queue.run_refresh(listings_collection, requests_collection))
+    auto_match_task = asyncio.create_task(urgency_queue.run_auto_matching(submit_urgent_matching)) if URGENT_AUTO_MATCH else None
+    if schema_watcher is not None:
+        schema_watcher.start()
+    try:
+        yield
+    finally:
+        graph_check_task.cancel()
+        stats_task.cancel()
+        revocations_task.cancel()
+        archiver_task.cancel()
+        urgency_task.cancel()
+        if auto_match_task is not None:
+            auto_match_task.cancel()
+        await matching_jobs.stop()
+        if schema_watcher is not None:
+            schema_watcher.stop()
+        password_hasher.shutdown()
+        llm_cache.close()
+        await neo4j_driver.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS middleware for frontend integration
 app.add_middleware(
@@ -179,20 +330,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+async def seed_id_counters():
+    # Make sure the id counters never fall behind ids that already exist
+    await seed_counters(db, ["users", "listings", "requests"])
+
+# Indexes and constraints derived from schema.xml (disable with BOOTSTRAP_INDEXES=0)
+INDEX_PLAN = load_index_plan(SCHEMA_XML_PATH)
+
+async def bootstrap_indexes():
+    if os.environ.get("BOOTSTRAP_INDEXES", "1") != "1":
+        return
+    # Indexes whose unique flag differs from schema.xml are only rebuilt on request
+    await ensure_mongo_indexes(db, INDEX_PLAN, repair=os.environ.get("BOOTSTRAP_INDEXES_REPAIR") == "1")
+    await ensure_neo4j_constraints(neo4j_driver, INDEX_PLAN)
+
+async def calibrate_password_hashing():
+    # An explicit BCRYPT_ROUNDS wins over calibration
+    if "BCRYPT_ROUNDS" not in os.environ:
+        await password_hasher.calibrate(float(os.environ.get("BCRYPT_TARGET_MS", "250")))
+
 # ---------------------
 # Utility Functions
 # ---------------------
 
-def hash_password(password: str) -> str:
-    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
-    return hashed.decode("utf-8")
+# bcrypt runs in its own bounded thread pool so it never blocks the event loop
+password_hasher = hasher_from_env()
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordQueueFull:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except PasswordQueueFull:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -208,92 +387,88 @@ async def get_user_by_email(email: str) -> Optional[Dict]:
     return await users_collection.find_one({"email": email})
 
 async def get_user_by_id(user_id: str) -> Optional[Dict]:
-    return await users_collection.find_one({"id": user_id})
+    return await user_cache.get(user_id)
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict:
-    credentials_exception = HTTPException(
+def user_token_claims(user: Dict) -> Dict[str, Any]:
+    """Claims that let get_current_user authenticate without a database lookup."""
+    return {
+        "sub": user["email"],
+        "uid": user["id"],
+        "role": user["role"],
+        "location": user["location"],
+        "ver": user.get("token_version", 0),
+    }
+
+async def bump_token_version(user_id: str):
+    """Invalidate every token issued to a user so far."""
+    user = await users_collection.find_one_and_update(
+        {"id": user_id}, {"$inc": {"token_version": 1}},
+        projection={"_id": 0, "token_version": 1}, return_document=ReturnDocument.AFTER,
+    )
+    user_cache.invalidate(user_id)
+    if user is not None:
+        await token_revocations.revoke(user_id, user["token_version"])
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_access_token(token: str) -> Dict[str, Any]:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except jwt.JWTError:
-        raise credentials_exception
-    user = await get_user_by_email(email)
+        raise credentials_exception()
+    if payload.get("sub") is None:
+        raise credentials_exception()
+    return payload
+
+async def load_token_user(payload: Dict[str, Any]) -> Dict:
+    """
+    The user behind a token, checked against the token's version. The version
+    is read from Mongo, not user_cache: another worker may have bumped it.
+    """
+    if "uid" not in payload or "ver" not in payload:
+        # Tokens issued before claims were embedded
+        user = await get_user_by_email(payload["sub"])
+    elif not token_revocations.is_current(payload["uid"], payload["ver"]):
+        user = None
+    else:
+        user = await users_collection.find_one({"id": payload["uid"]}, {"_id": 0})
+        if user is not None and user.get("token_version", 0) != payload["ver"]:
+            user = None
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
     return user
 
-def check_type(value, expected_type):
-    """Validate if the value matches the expected type."""
-    if expected_type == "string":
-        return isinstance(value, str)
-    elif expected_type == "integer":
-        return isinstance(value, int)
-    elif expected_type == "float":
-        return isinstance(value, float)
-    elif expected_type == "boolean":
-        return isinstance(value, bool)
-    elif expected_type == "datetime":
-        return isinstance(value, datetime)
-    else:
-        raise ValueError(f"Unknown type {expected_type}")
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict:
+    """
+    Caller identity for read endpoints, taken from the token claims. Mongo
+    is only consulted when the token's version is below the user's latest
+    revocation (or for old tokens without claims).
+    """
+    payload = decode_access_token(token)
+    if "uid" in payload and "ver" in payload and token_revocations.is_current(payload["uid"], payload["ver"]):
+        return {
+            "id": payload["uid"],
+            "email": payload["sub"],
+            "role": payload.get("role"),
+            "location": payload.get("location"),
+        }
+    return await load_token_user(payload)
+
+async def get_verified_user(token: str = Depends(oauth2_scheme)) -> Dict:
+    """Caller identity for write endpoints: the stored user, with the token version checked."""
+    return await load_token_user(decode_access_token(token))
 
 def validate_mongo_data(collection_name, data):
-    caller = inspect.stack()[1].function
-    print(f"[DEBUG] Called from {caller}: Validating MongoDB data for collection: {collection_name}")
-
-    if "MongoDB" not in DATABASE_SCHEMA or "inventory_app" not in DATABASE_SCHEMA["MongoDB"] or collection_name not in DATABASE_SCHEMA["MongoDB"]["inventory_app"]:
-        raise ValueError(f"Collection '{collection_name}' is not defined in the schema for database 'inventory_app'.")
-
-    schema = DATABASE_SCHEMA["MongoDB"]["inventory_app"][collection_name]
-    for key, value in data.items():
-        if key not in schema:
-            raise ValueError(f"Invalid field '{key}' for collection '{collection_name}'.")
-        expected_type = schema[key]
-        if not check_type(value, expected_type):
-            raise TypeError(f"Incorrect type for '{key}'. Expected '{expected_type}', got '{type(value).__name__}'.")
-
-    print("[DEBUG] MongoDB Validation passed!")
-    return True
+    return COMPILED_SCHEMA.mongo_validator(collection_name)(data)
 
 
 def validate_neo4j_data(node_or_rel, entity_type, data):
-    caller = inspect.stack()[1].function
-    print(f"[DEBUG] Called from {caller}: Validating Neo4j data for {node_or_rel}: {entity_type}")
-
-    if "cities_db" not in DATABASE_SCHEMA:
-        print("[DEBUG] cities_db not found in schema")
-        raise ValueError("Neo4j database not defined in schema.")
-
-    if node_or_rel not in DATABASE_SCHEMA["cities_db"]:
-        print(f"[DEBUG] {node_or_rel} not found in DATABASE_SCHEMA['cities_db']")
-        print(f"[DEBUG] Available keys: {DATABASE_SCHEMA['cities_db'].keys()}")
-        raise ValueError(f"{node_or_rel} is not defined in Neo4j schema.")
-
-    if entity_type not in DATABASE_SCHEMA["cities_db"][node_or_rel]:
-        print(f"[DEBUG] {entity_type} not found in DATABASE_SCHEMA['cities_db'][{node_or_rel}]")
-        raise ValueError(f"{entity_type} is not defined in Neo4j schema.")
-
-    schema = DATABASE_SCHEMA["cities_db"][node_or_rel][entity_type]
-
-    print("[DEBUG] Schema for validation:")
-    print(schema)
-
-    for key, value in data.items():
-        if key not in schema:
-            raise ValueError(f"Invalid field '{key}' for {entity_type}.")
-
-        expected_type = schema[key]
-        if not check_type(value, expected_type):
-            raise TypeError(f"Incorrect type for '{key}'. Expected {expected_type}, got {type(value).__name__}.")
-
-    print("[DEBUG] Neo4j Validation passed!")
-    return True
+    return COMPILED_SCHEMA.neo4j_validator(node_or_rel, entity_type)(data)
 
 
 # ---------------------
@@ -316,6 +491,10 @@ class UserOut(BaseModel):
     role: str
     location: str
 
+class UserUpdateOut(UserOut):
+    # Set when the caller changed their own sign-in claims; their old token no longer works
+    access_token: Optional[str] = None
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -341,6 +520,7 @@ class RequestModel(BaseModel):
     id: Optional[str] = None
     listing_id: str
     requester_id: str
+    supermarket_id: Optional[str] = None
     location: str
     status: str  # "pending", "approved", "declined"
     notes: Optional[str] = None
@@ -364,8 +544,25 @@ class NotificationModel(BaseModel):
     is_read: bool = False
     created_at: Optional[datetime] = None
 
+# Upper bounds for the multi-hop food bank search (matching and /api/food-banks/nearest)
+MATCHING_MAX_FOOD_BANKS = 100
+MATCHING_MAX_DISTANCE_KM = 1000
+
 class MatchingRequest(BaseModel):
     listing_id: str
+    max_distance_km: Optional[float] = Field(None, ge=0, le=MATCHING_MAX_DISTANCE_KM)  # search food banks over multiple hops up to this road distance
+    max_food_banks: int = Field(10, ge=1, le=MATCHING_MAX_FOOD_BANKS)  # only used together with max_distance_km
+
+class BatchMatchingRequest(BaseModel):
+    listing_ids: List[str]
+    max_distance_km: Optional[float] = Field(None, ge=0, le=MATCHING_MAX_DISTANCE_KM)
+    max_food_banks: int = Field(10, ge=1, le=MATCHING_MAX_FOOD_BANKS)
+
+class NearbyFoodBank(BaseModel):
+    id: Optional[str] = None
+    name: str
+    location: str
+    distance: float
 
 # Models for managing Neo4j data
 class CityModel(BaseModel):
@@ -380,6 +577,10 @@ class CityWithNeighbors(BaseModel):
     name: str
     neighbors: List[str]
 
+class CityImportRequest(BaseModel):
+    cities: List[str] = []
+    edges: List[NeighborRelationshipModel] = []
+
 # ---------------------
 # API Routes
 # ---------------------
@@ -389,19 +590,26 @@ class CityWithNeighbors(BaseModel):
 async def register(user: UserModel):
     if await get_user_by_email(user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
-    user.password = hash_password(user.password)
-    user.id = str(await users_collection.count_documents({}) + 1)
+    user.password = await hash_password(user.password)
+    user.id = await id_allocator.next_id("users")
     user.created_at = datetime.now(timezone.utc)
     validate_mongo_data('users', user.dict())
     await users_collection.insert_one(user.dict())
+    user_cache.invalidate(user.id)
+    await stats_store.record(user_delta(user.dict()))
     return {"msg": "User registered successfully", "user_id": user.id}
 
 @app.post("/api/auth/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     user = await get_user_by_email(form_data.username)
-    if not user or not verify_password(form_data.password, user["password"]):
+    if not user or not await verify_password(form_data.password, user["password"]):
         raise HTTPException(status_code=400, detail="Invalid email or password")
-    token = create_access_token({"sub": user["email"], "role": user["role"]})
+    if password_hasher.needs_rehash(user["password"]):
+        # Upgrade hashes made with an older, cheaper cost while we have the plain password
+        new_hash = await hash_password(form_data.password)
+        await users_collection.update_one({"id": user["id"], "password": user["password"]}, {"$set": {"password": new_hash}})
+        user_cache.invalidate(user["id"])
+    token = create_access_token(user_token_claims(user))
     curr_role = user['role']
     return {"access_token": token, "role": curr_role, "token_type": "bearer"}
 
@@ -410,52 +618,163 @@ async def get_user(user_id: str, current_user: Dict = Depends(get_current_user))
     user = await get_user_by_id(user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return UserOut(**user)
+    return json_response(dump_rows(UserOut, [user])[0])
 
-@app.put("/api/users/{user_id}", response_model=UserOut)
-async def update_user(user_id: str, user_update: UserModel, current_user: Dict = Depends(get_current_user)):
+# A change to any of these makes the user's existing tokens stale
+TOKEN_CLAIM_FIELDS = {"email", "password", "role", "location"}
+
+@app.post("/api/users/{user_id}/revoke-tokens", response_model=Dict[str, Any])
+async def revoke_user_tokens(user_id: str, current_user: Dict = Depends(get_verified_user)):
+    """Sign a user out everywhere (the user themselves or an admin)."""
+    if current_user["id"] != user_id and current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if await get_user_by_id(user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    await bump_token_version(user_id)
+    return {"msg": "Tokens revoked"}
+
+@app.put("/api/users/{user_id}", response_model=UserUpdateOut)
+async def update_user(user_id: str, user_update: UserModel, current_user: Dict = Depends(get_verified_user)):
     user = await get_user_by_id(user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     update_data = user_update.dict(exclude_unset=True)
+    # The form always resends every field, so only values that differ revoke tokens
+    claims_changed = any(
+        field in update_data and update_data[field] != user.get(field)
+        for field in TOKEN_CLAIM_FIELDS - {"password"}
+    )
     if "password" in update_data:
-        update_data["password"] = hash_password(update_data["password"])
+        if await verify_password(update_data["password"], user["password"]):
+            del update_data["password"]
+        else:
+            update_data["password"] = await hash_password(update_data["password"])
+            claims_changed = True
     await users_collection.update_one({"id": user_id}, {"$set": update_data})
+    user_cache.invalidate(user_id)
+    if claims_changed:
+        await bump_token_version(user_id)
+    await stats_store.record(change_delta(user_delta, user, {**user, **update_data}))
     user = await get_user_by_id(user_id)
-    return UserOut(**user)
+    updated = UserUpdateOut(**user)
+    if claims_changed and current_user["id"] == user_id:
+        updated.access_token = create_access_token(user_token_claims(user))
+    return updated
 
 # Listings Routes
 @app.post("/api/listings", response_model=Dict[str, Any])
-async def create_listing(listing: ListingModel, current_user: Dict = Depends(get_current_user)):
+async def create_listing(listing: ListingModel, current_user: Dict = Depends(get_verified_user)):
     if current_user["role"] not in ["supermarket","admin"]:
         raise HTTPException(status_code=403, detail="Only supermarkets can create listings")
 
     listing_dict = listing.dict()
-    listing_dict["id"] = str(await listings_collection.count_documents({}) + 1)
+    listing_dict["id"] = await id_allocator.next_id("listings")
+    listing_dict["supermarket_id"] = current_user["id"]
     listing_dict["created_at"] = datetime.now(timezone.utc)
 
     # Validate data against XML schema
     validate_mongo_data("listings", listing_dict)
 
     await listings_collection.insert_one(listing_dict)
+    listing_cache.invalidate(listing_dict["id"])
+    urgency_queue.upsert(listing_dict)
+    await stats_store.record(listing_delta(listing_dict))
     return {"msg": "Listing created successfully", "listing_id": listing_dict["id"]}
 
+@app.post("/api/listings/import", response_model=Dict[str, Any])
+async def import_listings_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    current_user: Dict = Depends(get_verified_user),
+):
+    """
+    Bulk-create listings from a CSV (header row first) or NDJSON upload.
+    The format comes from `format` or the file extension. Valid rows are
+    inserted and every rejected row is reported with its line number.
+    """
+    if current_user["role"] not in ["supermarket","admin"]:
+        raise HTTPException(status_code=403, detail="Only supermarkets can create listings")
+    try:
+        fmt = detect_format(file.filename, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def next_listing_id():
+        return await id_allocator.next_id("listings")
+
+    async def record_inserted(docs):
+        for doc in docs:
+            listing_cache.invalidate(doc["id"])
+            urgency_queue.upsert(doc)
+        await stats_store.record(merge_deltas(listing_delta(doc) for doc in docs))
+
+    return await import_listings(
+        iter_rows(file.read, fmt),
+        COMPILED_SCHEMA.mongo_validator("listings"),
+        listings_collection,
+        next_listing_id,
+        current_user["id"],
+        on_inserted=record_inserted,
+    )
+
+def cursor_headers(next_cursor: Optional[str]) -> Optional[Dict[str, str]]:
+    return {"X-Next-Cursor": next_cursor} if next_cursor else None
+
+# Listings are paged by (expiry_date, id); schema.xml declares an index per filter combination
+LISTINGS_SORT = [("expiry_date", ASCENDING), ("id", ASCENDING)]
 
 @app.get("/api/listings", response_model=List[ListingModel])
-async def get_listings(skip: int = 0, limit: int = 10):
-    listings_cursor = listings_collection.find().skip(skip).limit(limit)
-    listings = await listings_cursor.to_list(length=limit)
-    return listings
+async def get_listings(
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    location: Optional[str] = None,
+    expires_after: Optional[datetime] = None,
+    expires_before: Optional[datetime] = None,
+):
+    """
+    Listings ordered by soonest expiry. Pass the X-Next-Cursor response
+    header back as `cursor` to get the next page. Expired listings are
+    left out unless `expires_after` asks for them.
+    """
+    limit = min(max(limit, 1), 100)
+    query: Dict[str, Any] = {}
+    if category:
+        query["category"] = category
+    if location:
+        query["location"] = location
+    query["expiry_date"] = {"$gte": expires_after or datetime.now(timezone.utc)}
+    if expires_before:
+        query["expiry_date"]["$lt"] = expires_before
+    try:
+        listings, next_cursor = await fetch_page(
+            listings_collection, query, LISTINGS_SORT, cursor, limit, model_projection(ListingModel)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(dump_rows(ListingModel, listings), headers=cursor_headers(next_cursor))
+
+URGENT_LISTINGS_MAX = 100
+
+@app.get("/api/listings/urgent", response_model=List[ListingModel])
+async def get_urgent_listings(limit: int = 10, current_user: Dict = Depends(get_current_user)):
+    """The unmatched listings closest to expiry, soonest first, from the in-memory urgency queue."""
+    urgent_ids = [listing_id for listing_id, _ in urgency_queue.most_urgent(min(max(limit, 1), URGENT_LISTINGS_MAX))]
+    if not urgent_ids:
+        return json_response([])
+    docs = await listings_collection.find({"id": {"$in": urgent_ids}}, model_projection(ListingModel)).to_list(None)
+    by_id = {doc["id"]: doc for doc in docs}
+    return json_response(dump_rows(ListingModel, [by_id[i] for i in urgent_ids if i in by_id]))
 
 @app.get("/api/listings/{listing_id}", response_model=ListingModel)
 async def get_listing(listing_id: str):
-    listing = await listings_collection.find_one({"id": listing_id})
+    listing = await listing_cache.get(listing_id)
     if listing is None:
         raise HTTPException(status_code=404, detail="Listing not found")
-    return ListingModel(**listing)
+    return json_response(dump_rows(ListingModel, [listing])[0])
 
 @app.put("/api/listings/{listing_id}", response_model=Dict[str, Any])
-async def update_listing(listing_id: str, listing_update: ListingModel, current_user: Dict = Depends(get_current_user)):
+async def update_listing(listing_id: str, listing_update: ListingModel, current_user: Dict = Depends(get_verified_user)):
     listing = await listings_collection.find_one({"id": listing_id})
     if listing is None:
         raise HTTPException(status_code=404, detail="Listing not found")
@@ -463,23 +782,34 @@ async def update_listing(listing_id: str, listing_update: ListingModel, current_
         raise HTTPException(status_code=403, detail="Not authorized to update this listing")
     update_data = listing_update.dict(exclude_unset=True)
     await listings_collection.update_one({"id": listing_id}, {"$set": update_data})
+    listing_cache.invalidate(listing_id)
+    urgency_queue.upsert({**listing, **update_data})
+    await stats_store.record(change_delta(listing_delta, listing, {**listing, **update_data}))
+    await llm_cache.invalidate_listing(listing_id)
     return {"msg": "Listing updated successfully"}
 
 @app.delete("/api/listings/{listing_id}", response_model=Dict[str, Any])
-async def delete_listing(listing_id: str, current_user: Dict = Depends(get_current_user)):
+async def delete_listing(listing_id: str, current_user: Dict = Depends(get_verified_user)):
     listing = await listings_collection.find_one({"id": listing_id})
     if listing is None:
         raise HTTPException(status_code=404, detail="Listing not found")
     if listing["supermarket_id"] != current_user["id"]:
         raise HTTPException(status_code=403, detail="Not authorized to delete this listing")
     await listings_collection.delete_one({"id": listing_id})
+    listing_cache.invalidate(listing_id)
+    urgency_queue.remove(listing_id)
+    await stats_store.record(listing_delta(listing, -1))
+    await llm_cache.invalidate_listing(listing_id)
     return {"msg": "Listing deleted successfully"}
 
 # Requests Routes
 @app.post("/api/requests", response_model=Dict[str, Any])
-async def create_request(req: RequestCreate, current_user: Dict = Depends(get_current_user)):
+async def create_request(req: RequestCreate, current_user: Dict = Depends(get_verified_user)):
+    listing = await listing_cache.get(req.listing_id)
+    if listing is None:
+        raise HTTPException(status_code=404, detail="Listing not found")
     new_request = {
-        "id": str(await requests_collection.count_documents({}) + 1),
+        "id": await id_allocator.next_id("requests"),
         "listing_id": req.listing_id,
         "requester_id": current_user["id"],
         "location": current_user["location"],
@@ -487,148 +817,327 @@ async def create_request(req: RequestCreate, current_user: Dict = Depends(get_cu
         "notes": req.notes,
         "created_at": datetime.now(timezone.utc)
     }
+    # Denormalized owner, so a supermarket's inbox is a single indexed query
+    if listing.get("supermarket_id"):
+        new_request["supermarket_id"] = listing["supermarket_id"]
     validate_mongo_data("requests", new_request)
     await requests_collection.insert_one(new_request)
+    await stats_store.record(request_delta(new_request))
     return {"msg": "Request created successfully", "request_id": new_request["id"]}
 
+# Newest first; schema.xml declares (owner, [status,] -created_at, -id) indexes to match
+REQUESTS_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+REQUEST_STATUSES = ("pending", "approved", "declined")
+
+def requests_owner_filter(current_user: Dict) -> Dict[str, Any]:
+    if current_user["role"] == "supermarket":
+        return {"supermarket_id": current_user["id"]}
+    return {"requester_id": current_user["id"]}
+
 @app.get("/api/requests", response_model=List[RequestModel])
-async def get_requests(current_user: Dict = Depends(get_current_user)):
-    role = current_user["role"]
-    if role == "supermarket":
-        listings = await listings_collection.find({"supermarket_id": current_user["id"]}).to_list(length=100)
-        listing_ids = [listing["id"] for listing in listings]
-        cursor = requests_collection.find({"listing_id": {"$in": listing_ids}})
-    else:
-        cursor = requests_collection.find({"requester_id": current_user["id"]})
-    requests_list = await cursor.to_list(length=100)
-    return requests_list
+async def get_requests(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    listing_id: Optional[str] = None,
+    current_user: Dict = Depends(get_current_user),
+):
+    """
+    Request inbox: requests received (supermarkets) or made (everyone else),
+    newest first. Pass the X-Next-Cursor response header back as `cursor`
+    to get the next page.
+    """
+    if status is not None and status not in REQUEST_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(REQUEST_STATUSES)}")
+    limit = min(max(limit, 1), 100)
+    query = requests_owner_filter(current_user)
+    if status:
+        query["status"] = status
+    if listing_id:
+        query["listing_id"] = listing_id
+    try:
+        requests_list, next_cursor = await fetch_page(
+            requests_collection, query, REQUESTS_SORT, cursor, limit, model_projection(RequestModel)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(dump_rows(RequestModel, requests_list), headers=cursor_headers(next_cursor))
+
+@app.get("/api/requests/pending-counts", response_model=Dict[str, int])
+async def get_pending_request_counts(current_user: Dict = Depends(get_current_user)):
+    """Pending request count per listing, in one aggregation."""
+    pipeline = [
+        {"$match": {**requests_owner_filter(current_user), "status": "pending"}},
+        {"$group": {"_id": "$listing_id", "count": {"$sum": 1}}},
+    ]
+    return {doc["_id"]: doc["count"] async for doc in requests_collection.aggregate(pipeline)}
 
 @app.get("/api/requests/{request_id}", response_model=RequestModel)
 async def get_request(request_id: str, current_user: Dict = Depends(get_current_user)):
-    req = await requests_collection.find_one({"id": request_id})
+    req = await find_one(requests_collection, RequestModel, {"id": request_id})
     if req is None:
         raise HTTPException(status_code=404, detail="Request not found")
-    return RequestModel(**req)
+    return json_response(req)
 
 @app.put("/api/requests/{request_id}", response_model=Dict[str, Any])
-async def update_request(request_id: str, req_update: RequestUpdate, current_user: Dict = Depends(get_current_user)):
+async def update_request(request_id: str, req_update: RequestUpdate, current_user: Dict = Depends(get_verified_user)):
     req = await requests_collection.find_one({"id": request_id})
     if req is None:
         raise HTTPException(status_code=404, detail="Request not found")
-    listing = await listings_collection.find_one({"id": req["listing_id"]})
-    if listing is None or listing["supermarket_id"] != current_user["id"]:
+    owner = req.get("supermarket_id")
+    if owner is None:
+        listing = await listing_cache.get(req["listing_id"])
+        owner = listing.get("supermarket_id") if listing else None
+    if owner != current_user["id"]:
         raise HTTPException(status_code=403, detail="Not authorized to update this request")
     update_data = req_update.dict(exclude_unset=True)
     await requests_collection.update_one({"id": request_id}, {"$set": update_data})
+    if update_data.get("status") == "approved":
+        urgency_queue.mark_matched(req["listing_id"])
+    elif req["status"] == "approved" and update_data.get("status") is not None:
+        # The listing is unmatched again unless another of its requests is still approved
+        still_matched = await requests_collection.count_documents(
+            {"listing_id": req["listing_id"], "status": "approved"}, limit=1
+        )
+        listing = None if still_matched else await listing_cache.get(req["listing_id"])
+        if listing is not None:
+            urgency_queue.unmark_matched(listing)
+    await stats_store.record(change_delta(request_delta, req, {**req, **update_data}))
     return {"msg": "Request updated successfully"}
 
 # Notifications Routes
 @app.get("/api/notifications", response_model=List[NotificationModel])
 async def get_notifications(current_user: Dict = Depends(get_current_user)):
-    cursor = notifications_collection.find({"user_id": current_user["id"]})
-    notifications = await cursor.to_list(length=100)
-    return notifications
+    notifications = await find_many(notifications_collection, NotificationModel, {"user_id": current_user["id"]}, limit=100)
+    return json_response(notifications)
 
 @app.put("/api/notifications/{notification_id}/read", response_model=Dict[str, Any])
-async def mark_notification_read(notification_id: str, current_user: Dict = Depends(get_current_user)):
+async def mark_notification_read(notification_id: str, current_user: Dict = Depends(get_verified_user)):
     await notifications_collection.update_one({"id": notification_id, "user_id": current_user["id"]}, {"$set": {"is_read": True}})
     return {"msg": "Notification marked as read"}
 
 # Admin Routes (Assumes current_user has admin privileges)
+# Admin listing: bounded keyset pages by default, full streaming export on request
+ADMIN_PAGE_SORT = [("_id", ASCENDING)]
+ADMIN_PAGE_MAX = 500
+# Fields an admin may page through or export; never the password hash
+ADMIN_EXPORT_FIELDS = {
+    "users": list(UserOut.model_fields),
+    "listings": list(ListingModel.model_fields),
+    "requests": list(RequestModel.model_fields),
+}
+ADMIN_COLLECTIONS = {
+    "users": users_collection,
+    "listings": listings_collection,
+    "requests": requests_collection,
+}
+
+async def admin_page(collection, model, limit: int, cursor: Optional[str]) -> Response:
+    limit = min(max(limit, 1), ADMIN_PAGE_MAX)
+    try:
+        docs, next_cursor = await fetch_page(collection, {}, ADMIN_PAGE_SORT, cursor, limit, model_projection(model, "_id"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(dump_rows(model, docs), headers=cursor_headers(next_cursor))
+
 @app.get("/api/admin/users", response_model=List[UserOut])
-async def admin_get_users(current_user: Dict = Depends(get_current_user)):
+async def admin_get_users(limit: int = 100, cursor: Optional[str] = None, current_user: Dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    cursor = users_collection.find()
-    users = await cursor.to_list(length=100)
-    return [UserOut(**user) for user in users]
+    return await admin_page(users_collection, UserOut, limit, cursor)
 
 @app.get("/api/admin/listings", response_model=List[ListingModel])
-async def admin_get_listings(current_user: Dict = Depends(get_current_user)):
+async def admin_get_listings(limit: int = 100, cursor: Optional[str] = None, current_user: Dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    cursor = listings_collection.find()
-    listings = await cursor.to_list(length=100)
-    return [ListingModel(**listing) for listing in listings]
+    return await admin_page(listings_collection, ListingModel, limit, cursor)
 
 @app.get("/api/admin/requests", response_model=List[RequestModel])
-async def admin_get_requests(current_user: Dict = Depends(get_current_user)):
+async def admin_get_requests(limit: int = 100, cursor: Optional[str] = None, current_user: Dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    cursor = requests_collection.find()
-    requests_list = await cursor.to_list(length=100)
-    return [RequestModel(**req) for req in requests_list]
+    return await admin_page(requests_collection, RequestModel, limit, cursor)
+
+@app.get("/api/admin/export/{collection_name}")
+async def admin_export(
+    collection_name: str,
+    format: str = "ndjson",
+    fields: Optional[str] = None,
+    after: Optional[str] = None,
+    current_user: Dict = Depends(get_current_user),
+):
+    """
+    Stream a whole collection as NDJSON or CSV in constant memory.
+    `fields` is a comma-separated projection; every row carries `_id`, and
+    passing the last one received as `after` resumes an interrupted export.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if collection_name not in ADMIN_COLLECTIONS:
+        raise HTTPException(status_code=404, detail="Unknown collection")
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+
+    allowed = ADMIN_EXPORT_FIELDS[collection_name]
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else allowed
+    unknown = [f for f in selected if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    try:
+        cursor = export_cursor(ADMIN_COLLECTIONS[collection_name], selected, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if format == "csv":
+        return StreamingResponse(
+            stream_csv(cursor, selected),
+            media_type="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={collection_name}.csv"},
+        )
+    return StreamingResponse(stream_ndjson(cursor, selected), media_type="application/x-ndjson")
 
 @app.get("/api/admin/stats", response_model=Dict[str, Any])
 async def admin_stats(current_user: Dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    user_count = await users_collection.count_documents({})
-    listing_count = await listings_collection.count_documents({})
-    request_count = await requests_collection.count_documents({})
+    return await stats_store.get()
+
+@app.get("/api/admin/indexes", response_model=Dict[str, Any])
+async def admin_index_stats(current_user: Dict = Depends(get_current_user)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    try:
+        neo4j_stats = await neo4j_index_stats(neo4j_driver)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading Neo4j index stats: {str(e)}")
     return {
-        "user_count": user_count,
-        "listing_count": listing_count,
-        "request_count": request_count,
+        "mongo": await mongo_index_stats(db, list(INDEX_PLAN["mongo"])),
+        "neo4j": neo4j_stats,
+    }
+
+@app.post("/api/admin/listings/archive-expired", response_model=Dict[str, Any])
+async def archive_expired_listings(current_user: Dict = Depends(get_verified_user)):
+    """Run the expiry sweep now instead of waiting for the next scheduled one."""
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return await listing_archiver.sweep()
+
+@app.get("/api/admin/metrics", response_model=Dict[str, Any])
+async def admin_metrics(current_user: Dict = Depends(get_current_user)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {
+        "llm_cache": llm_cache.metrics(),
+        "llm_client": llm_client.metrics(),
+        "matching_jobs": matching_jobs.metrics(),
+        "entity_cache": {"users": user_cache.metrics(), "listings": listing_cache.metrics()},
+        "token_revocations": token_revocations.metrics(),
+        "listing_lifecycle": listing_archiver.metrics(),
+        "urgency_queue": urgency_queue.metrics(),
     }
 
 # Automated Matching Route
-def generate_matching_suggestions(listing: dict, bank_info: list) -> str:
-    """
-    Build a prompt from listing details and nearby cities, call Gemini LLM,
-    and return its generated text.
-    """
-    # Construct the prompt text using listing and food bank context
-    prompt_text = f"""
-Listing Details:
-Title: {listing.get('title')}
-Description: {listing.get('description')}
-Category: {listing.get('category')}
-Quantity: {listing.get('quantity')}
-Expiry Date: {listing.get('expiry_date')}
-Location: {listing.get('location')}
-
-Nearby Food Banks:
-{chr(10).join(bank_info)}
-
-Based on the above information, provide matching suggestions for 2 possible ideal food banks that could receive this listing. Return your answer as JSON with the keys:
-- "inventory_item_id": string,
-- "recommended_food_bank_id": string,
-- "explanation": string.
-"""
-    client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
-    model = "gemini-2.0-flash"
-    contents = [
-        types.Content(
-            role="user",
-            parts=[types.Part.from_text(text=prompt_text)]
-        )
-    ]
-    generate_content_config = types.GenerateContentConfig(
-        temperature=1,
-        top_p=0.95,
-        top_k=40,
-        max_output_tokens=8192,
-        response_mime_type="text/plain",
-    )
-    output = ""
-    for chunk in client.models.generate_content_stream(
-        model=model,
-        contents=contents,
-        config=generate_content_config,
-    ):
-        output += chunk.text
+LLM_MODEL = "gemini-2.0-flash"
+# Everything besides the prompt that changes the LLM output; part of the cache key
+LLM_CONFIG = {
+    "model": LLM_MODEL,
+    "temperature": LLM_TEMPERATURE,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": LLM_MAX_OUTPUT_TOKENS,
+}
+
+# One long-lived async Gemini client with deadlines, a concurrency cap and retries
+llm_client = LLMClient(LLM_CONFIG)
+
+async def generate_matching_suggestions(prompt_text: str) -> str:
+    """
+    Call Gemini LLM with a matching prompt and return its generated text.
+    """
+    return await llm_client.generate(prompt_text)
+
+async def matching_suggestions(listing: dict, bank_info: list) -> str:
+    """
+    Build a prompt from listing details and nearby food banks and return the
+    LLM's suggestions, served from the response cache when possible.
+    """
+    # Construct the prompt text using listing and food bank context, within the token budget
+    prompt_text, _ = build_prompt(listing, bank_info)
+    key = make_cache_key(prompt_text, LLM_CONFIG)
+    cached = await llm_cache.get(key)
+    if cached is not None:
+        return cached
+    output = await generate_matching_suggestions(prompt_text)
+    await llm_cache.set(key, output, listing_id=listing.get("id"), locations=[listing.get("location")])
     return output
 
-# Updated Matching Endpoint with LLM integration
-@app.post("/api/matching", response_model=Dict[str, Any])
-async def matching_endpoint(match_req: MatchingRequest, current_user: Dict = Depends(get_current_user)):
+async def stream_matching_suggestions(listing: dict, bank_info: list):
+    """
+    Same as matching_suggestions, but yields the LLM text chunk by chunk.
+    A cache hit is yielded as a single chunk.
+    """
+    prompt_text, _ = build_prompt(listing, bank_info)
+    key = make_cache_key(prompt_text, LLM_CONFIG)
+    cached = await llm_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    output = ""
+    async for text in llm_client.stream(prompt_text):
+        output += text
+        yield text
+    await llm_cache.set(key, output, listing_id=listing.get("id"), locations=[listing.get("location")])
+
+async def find_nearest_food_banks(city: str, max_distance_km: float, k: int) -> List[Dict]:
+    """
+    Return up to k food banks reachable from `city` within max_distance_km of
+    road distance (over any number of NEIGHBOR_OF hops), nearest first.
+    """
+    distances = city_graph.shortest_distances(city, max_distance_km) or {city: 0.0}
+    food_banks = await users_collection.find(
+        {"location": {"$in": list(distances)}, "role": "food_bank"},
+        {"_id": 0, "id": 1, "name": 1, "location": 1}
+    ).to_list(None)
+    for fb in food_banks:
+        fb["distance"] = distances[fb["location"]]
+    food_banks.sort(key=lambda fb: (fb["distance"], fb["name"]))
+    return food_banks[:k]
+
+async def find_candidate_food_banks(city: str, max_distance_km: Optional[float] = None, max_food_banks: int = 10) -> List[Dict]:
+    """
+    Food banks considered for a listing in `city`: the direct neighbors plus
+    the city itself, or the multi-hop search when max_distance_km is given.
+    """
+    if max_distance_km is not None:
+        return await find_nearest_food_banks(city, max_distance_km, max_food_banks)
+
+    distances = {neighbor: distance for neighbor, distance in city_graph.neighbors(city)}
+    distances[city] = 0  # Add the current city with 0 distance
+    food_banks = await users_collection.find(
+        {"location": {"$in": list(distances)}, "role": "food_bank"},
+        {"_id": 0, "id": 1, "name": 1, "location": 1}
+    ).to_list(None)
+    for fb in food_banks:
+        fb["distance"] = distances[fb["location"]]
+    return food_banks
+
+@app.get("/api/food-banks/nearest", response_model=List[NearbyFoodBank])
+async def nearest_food_banks(
+    city: str,
+    max_distance_km: float = Query(50, ge=0, le=MATCHING_MAX_DISTANCE_KM),
+    k: int = Query(5, ge=1, le=MATCHING_MAX_FOOD_BANKS),
+    current_user: Dict = Depends(get_current_user),
+):
+    return await find_nearest_food_banks(city, max_distance_km, k)
+
+async def prepare_matching(match_req: MatchingRequest, current_user: Dict):
+    """Load the listing and rank its candidate food banks; shared by the matching endpoints."""
     # Restrict to supermarket and admin roles
     if current_user.get("role") not in ["supermarket", "admin"]:
         raise HTTPException(status_code=403, detail="Only supermarkets can access matching suggestions")
 
-    listing_id = match_req.listing_id
-    listing = await listings_collection.find_one({"id": listing_id})
+    listing = await listing_cache.get(match_req.listing_id)
     if not listing:
         raise HTTPException(status_code=404, detail="Listing not found")
 
@@ -637,52 +1146,203 @@ async def matching_endpoint(match_req: MatchingRequest, current_user: Dict = Dep
     if not food_bank_location:
         raise HTTPException(status_code=400, detail="Food bank location not set")
 
-    # Get neighboring cities and distances from Neo4j
-    def get_relevant_cities_and_distances(tx, city: str):
-        query = """
-        MATCH (c:City {name: $city})-[r:NEIGHBOR_OF]-(neighbor)
-        RETURN neighbor.name AS city, r.distance AS distance
-        """
-        result = tx.run(query, city=city)
-        return [{"city": record["city"], "distance": record["distance"]} for record in result]
+    candidates = await find_candidate_food_banks(food_bank_location, match_req.max_distance_km, match_req.max_food_banks)
 
-    with neo4j_driver.session() as session:
-        try:
-            cities_data = session.read_transaction(get_relevant_cities_and_distances, food_bank_location)
-            cities_data.append({"city": food_bank_location, "distance": 0})  # Add the current city with 0 distance
-        except Exception as e:
-            raise HTTPException(status_code=500, detail="Error querying Neo4j: " + str(e))
+    # Rank locally and only send the best few to the LLM
+    return listing, rank_candidates(listing, candidates)
 
-    # Query food banks in the relevant cities
-    city_names = [entry["city"] for entry in cities_data]
-    food_banks = await users_collection.find(
-        {"location": {"$in": city_names}, "role": "food_bank"},
-        {"_id": 0, "name": 1, "location": 1}
-    ).to_list(None)
+# Updated Matching Endpoint with LLM integration
+@app.post("/api/matching", response_model=Dict[str, Any])
+async def matching_endpoint(match_req: MatchingRequest, current_user: Dict = Depends(get_current_user)):
+    listing_id = match_req.listing_id
+    listing, ranked = await prepare_matching(match_req, current_user)
+    if len(ranked) <= 1:
+        # Nothing to choose between, so skip the LLM call
+        return {
+            "listing_id": listing_id,
+            "matches_llm_output": deterministic_result(listing, ranked),
+            "source": "ranking"
+        }
 
-    # Create a mapping of city -> food banks
-    food_banks_by_city = {}
-    for fb in food_banks:
-        city = fb["location"]
-        if city not in food_banks_by_city:
-            food_banks_by_city[city] = []
-        food_banks_by_city[city].append(fb["name"])
-
-    # Format data for the LLM prompt
-    bank_info = []
-    for entry in cities_data:
-        city = entry["city"]
-        distance = entry["distance"]
-        banks = food_banks_by_city.get(city, [])
-        for bank in banks:
-            bank_info.append(f"{bank} (City: {city}, Distance: {distance} km)")
-
-    llm_response = generate_matching_suggestions(listing, bank_info)
+    try:
+        llm_response = await matching_suggestions(listing, [candidate_line(c) for c in ranked])
+    except LLMTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except LLMError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     return {
         "listing_id": listing_id,
-        "matches_llm_output": llm_response
+        "matches_llm_output": llm_response,
+        "source": "llm"
     }
 
+MATCHING_BATCH_MAX = int(os.environ.get("MATCHING_BATCH_MAX", "500"))
+
+async def run_batch_matching(listing_ids: List[str], max_distance_km: Optional[float] = None, max_food_banks: int = 10) -> List[Dict]:
+    """
+    Match many listings at once: one listings query, one candidate lookup per
+    location, and several listings packed into each LLM prompt.
+    Returns one result per requested listing id, in request order.
+    """
+    unique_ids = list(dict.fromkeys(listing_ids))
+    listings = await listings_collection.find({"id": {"$in": unique_ids}}).to_list(None)
+
+    # One graph lookup and one food bank query per location group
+    by_location: Dict[str, List[Dict]] = {}
+    for listing in listings:
+        by_location.setdefault(listing.get("location"), []).append(listing)
+    candidates_by_location = {}
+    for location in by_location:
+        if location:
+            candidates_by_location[location] = await find_candidate_food_banks(location, max_distance_km, max_food_banks)
+
+    results: Dict[str, Dict] = {}
+    locations = {listing["id"]: listing.get("location") for listing in listings}
+    llm_items = []
+    for listing in listings:
+        location = listing.get("location")
+        if not location:
+            results[listing["id"]] = {"listing_id": listing["id"], "error": "Food bank location not set"}
+            continue
+        ranked = rank_candidates(listing, candidates_by_location[location])
+        if len(ranked) <= 1:
+            output = deterministic_result(listing, ranked)
+            results[listing["id"]] = {
+                "listing_id": listing["id"],
+                "matches_llm_output": output,
+                "matches": parse_llm_output(output),
+                "source": "ranking",
+            }
+        else:
+            llm_items.append((listing, [candidate_line(c) for c in ranked]))
+
+    async def run_prompt(prompt_text: str, ids: List[str]):
+        max_output_tokens = MATCHING_BATCH_OUTPUT_TOKENS_PER_LISTING * len(ids)
+        key = make_cache_key(prompt_text, {**LLM_CONFIG, "max_output_tokens": max_output_tokens})
+        try:
+            output = await llm_cache.get(key)
+            if output is None:
+                output = await llm_client.generate(prompt_text, max_output_tokens=max_output_tokens)
+                await llm_cache.set(key, output, locations=[locations[listing_id] for listing_id in ids])
+        except LLMError as e:
+            for listing_id in ids:
+                results[listing_id] = {"listing_id": listing_id, "error": str(e)}
+            return
+        for listing_id, matches in split_batch_output(parse_llm_output(output), ids).items():
+            if not matches:
+                # Never hand back the shared output: it holds other listings' suggestions
+                results[listing_id] = {"listing_id": listing_id, "error": "No suggestion returned"}
+                continue
+            results[listing_id] = {
+                "listing_id": listing_id,
+                "matches_llm_output": json.dumps(matches),
+                "matches": matches,
+                "source": "llm",
+            }
+
+    # Prompts run concurrently; llm_client caps how many are in flight
+    await asyncio.gather(*(run_prompt(prompt_text, ids) for prompt_text, ids in build_batch_prompts(llm_items)))
+
+    return [
+        results.get(listing_id, {"listing_id": listing_id, "error": "Listing not found"})
+        for listing_id in listing_ids
+    ]
+
+@app.post("/api/matching/batch", response_model=Dict[str, Any])
+async def batch_matching_endpoint(batch_req: BatchMatchingRequest, current_user: Dict = Depends(get_current_user)):
+    if current_user.get("role") not in ["supermarket", "admin"]:
+        raise HTTPException(status_code=403, detail="Only supermarkets can access matching suggestions")
+    if not batch_req.listing_ids:
+        raise HTTPException(status_code=400, detail="listing_ids must not be empty")
+    if len(batch_req.listing_ids) > MATCHING_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {MATCHING_BATCH_MAX} listings per batch")
+    results = await run_batch_matching(batch_req.listing_ids, batch_req.max_distance_km, batch_req.max_food_banks)
+    return {"results": results}
+
+# Background matching jobs: submit returns a job id, workers run run_batch_matching
+async def run_matching_job(payload: Dict[str, Any]) -> List[Dict]:
+    return await run_batch_matching(payload["listing_ids"], payload.get("max_distance_km"), payload.get("max_food_banks", 10))
+
+matching_jobs = MatchingJobQueue(
+    matching_jobs_collection,
+    run_matching_job,
+    lambda: id_allocator.next_id("matching_jobs"),
+)
+
+async def submit_urgent_matching(listing_ids: List[str]):
+    # Queued like a user's batch job, so results can be read from /api/matching/jobs by an admin
+    payload = {"listing_ids": listing_ids[:MATCHING_BATCH_MAX], "max_distance_km": None, "max_food_banks": 10}
+    await matching_jobs.submit(payload, "system")
+
+@app.post("/api/matching/jobs", response_model=Dict[str, Any])
+async def submit_matching_job(batch_req: BatchMatchingRequest, current_user: Dict = Depends(get_verified_user)):
+    if current_user.get("role") not in ["supermarket", "admin"]:
+        raise HTTPException(status_code=403, detail="Only supermarkets can access matching suggestions")
+    if not batch_req.listing_ids:
+        raise HTTPException(status_code=400, detail="listing_ids must not be empty")
+    if len(batch_req.listing_ids) > MATCHING_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {MATCHING_BATCH_MAX} listings per job")
+    try:
+        job = await matching_jobs.submit(batch_req.dict(), current_user["id"])
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"job_id": job["id"], "status": job["status"]}
+
+@app.get("/api/matching/jobs", response_model=List[Dict[str, Any]])
+async def list_matching_jobs(status: Optional[str] = None, limit: int = 50, current_user: Dict = Depends(get_current_user)):
+    if status is not None and status not in JOB_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(JOB_STATUSES)}")
+    user_id = None if current_user.get("role") == "admin" else current_user["id"]
+    return await matching_jobs.list(user_id=user_id, status=status, limit=min(max(limit, 1), 200))
+
+@app.get("/api/matching/jobs/{job_id}", response_model=Dict[str, Any])
+async def get_matching_job(job_id: str, current_user: Dict = Depends(get_current_user)):
+    job = await matching_jobs.get(job_id)
+    if job is None or (current_user.get("role") != "admin" and job["user_id"] != current_user["id"]):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/api/matching/stream")
+async def matching_stream_endpoint(match_req: MatchingRequest, current_user: Dict = Depends(get_current_user)):
+    """
+    Server-sent events variant of /api/matching: "chunk" events carry the LLM
+    text as it arrives and a final "result" event carries the parsed answer.
+    """
+    listing_id = match_req.listing_id
+    # Validation and lookups happen before the stream starts so errors keep their status codes
+    listing, ranked = await prepare_matching(match_req, current_user)
+
+    async def events():
+        if len(ranked) <= 1:
+            source = "ranking"
+            output = deterministic_result(listing, ranked)
+            yield sse_event("chunk", {"text": output})
+        else:
+            source = "llm"
+            output = ""
+            try:
+                async for text in stream_matching_suggestions(listing, [candidate_line(c) for c in ranked]):
+                    output += text
+                    yield sse_event("chunk", {"text": text})
+            except LLMError as e:
+                yield sse_event("error", {"detail": str(e)})
+                return
+        yield sse_event("result", {
+            "listing_id": listing_id,
+            "matches_llm_output": output,
+            "matches": parse_llm_output(output),
+            "source": source,
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 
 # Neo4j City Management Routes
@@ -693,50 +1353,31 @@ async def create_city(city: CityModel):
     # Validate Neo4j data
     validate_neo4j_data("Nodes", "City", city_data)
 
-    query = "CREATE (c:City {name: $name})"
-    with neo4j_driver.session() as session:
-        session.run(query, name=city.name)
+    async def _create_city(tx, name: str) -> bool:
+        # MERGE rather than CREATE: City.name is unique, and a duplicate would raise ConstraintError
+        result = await tx.run("MERGE (c:City {name: $name})", name=name)
+        summary = await result.consume()
+        return summary.counters.nodes_created > 0
+
+    async with neo4j_driver.session() as session:
+        created = await session.execute_write(_create_city, city.name)
+    if not created:
+        raise HTTPException(status_code=409, detail=f"City {city.name} already exists")
+    city_graph.add_city(city.name)
+    await llm_cache.invalidate_locations([city.name])
 
     return {"msg": f"City {city.name} created successfully"}
 
 @app.get("/api/cities", response_model=List[CityWithNeighbors])
 async def get_city_names_with_neighbors(current_user: Dict = Depends(get_current_user)):
     """
-    Retrieves city names and their neighbors from Neo4j.
+    Retrieves city names and their neighbors from the in-memory city graph.
     """
-
-    def _get_city_names_with_neighbors(tx):
-        query = """
-        MATCH (c:City)-[:NEIGHBOR_OF]-(neighbor:City)
-        RETURN c.name AS cityName, collect(DISTINCT neighbor.name) AS neighborNames
-        """
-        result = tx.run(query)
-        city_neighbors_map = {}
-        for record in result:
-            city_name = record["cityName"]
-            neighbor_names = record["neighborNames"]
-            if city_name not in city_neighbors_map:
-                city_neighbors_map[city_name] = []
-            city_neighbors_map[city_name].extend(neighbor_names)
-
-        result2 = tx.run("MATCH (c:City) return c.name as cityName")
-        for record in result2:
-          city_name = record["cityName"]
-          if city_name not in city_neighbors_map:
-            city_neighbors_map[city_name] = []
-
-        return [CityWithNeighbors(name=city, neighbors=neighbors) for city, neighbors in city_neighbors_map.items()]
-
-    try:
-        with neo4j_driver.session() as session:
-            city_data = session.read_transaction(_get_city_names_with_neighbors)
-        return city_data
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving cities: {str(e)}")
+    return [CityWithNeighbors(name=city, neighbors=neighbors) for city, neighbors in city_graph.adjacency_by_name().items()]
 
 
 @app.post("/api/cities/neighbors", response_model=Dict[str, Any])
-async def create_neighbor_relationship(neighbor: NeighborRelationshipModel, current_user: Dict = Depends(get_current_user)):
+async def create_neighbor_relationship(neighbor: NeighborRelationshipModel, current_user: Dict = Depends(get_verified_user)):
     # Convert input data into a dictionary for validation
     relationship_data = {"distance": neighbor.distance}
 
@@ -746,25 +1387,60 @@ async def create_neighbor_relationship(neighbor: NeighborRelationshipModel, curr
     except (ValueError, TypeError) as e:
         raise HTTPException(status_code=400, detail=f"Validation Error: {str(e)}")
 
+    async def _create_neighbor_relationship(tx):
+        result = await tx.run("""
+            MATCH (a:City {name: $city_a}), (b:City {name: $city_b})
+            MERGE (a)-[r:NEIGHBOR_OF]->(b)
+            ON CREATE SET r.distance = $distance
+            MERGE (b)-[r2:NEIGHBOR_OF]->(a)
+            ON CREATE SET r2.distance = $distance
+        """, city_a=neighbor.city_a, city_b=neighbor.city_b, distance=neighbor.distance)
+        await result.consume()
+
     # Proceed with the database transaction
-    with neo4j_driver.session() as session:
+    async with neo4j_driver.session() as session:
         try:
-            session.write_transaction(
-                lambda tx: tx.run("""
-                    MATCH (a:City {name: $city_a}), (b:City {name: $city_b})
-                    MERGE (a)-[r:NEIGHBOR_OF]->(b)
-                    ON CREATE SET r.distance = $distance
-                    MERGE (b)-[r2:NEIGHBOR_OF]->(a)
-                    ON CREATE SET r2.distance = $distance
-                """, city_a=neighbor.city_a, city_b=neighbor.city_b, distance=neighbor.distance)
-            )
+            await session.execute_write(_create_neighbor_relationship)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error creating neighbor relationship: {str(e)}")
+    if city_graph.add_edge(neighbor.city_a, neighbor.city_b, neighbor.distance):
+        await llm_cache.invalidate_locations([neighbor.city_a, neighbor.city_b])
 
     return {
         "msg": f"Neighbor relationship between {neighbor.city_a} and {neighbor.city_b} created successfully with distance {neighbor.distance}."
     }
 
+@app.post("/api/cities/import", response_model=Dict[str, Any])
+async def import_city_graph(payload: CityImportRequest, current_user: Dict = Depends(get_verified_user)):
+    """
+    Bulk-load cities and neighbor relationships with batched UNWIND MERGE
+    writes. Cities are written first, so edges may refer to cities in the
+    same payload; re-sending a payload changes nothing.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    errors = COMPILED_SCHEMA.neo4j_validator("Nodes", "City").validate_many({"name": name} for name in payload.cities)
+    errors += COMPILED_SCHEMA.neo4j_validator("Relationships", "NEIGHBOR_OF").validate_many(
+        {"distance": edge.distance} for edge in payload.edges
+    )
+    if errors:
+        raise HTTPException(status_code=400, detail=f"Validation Error: {str(errors[0][1])}")
+
+    report: Dict[str, Any] = {}
+    try:
+        if payload.cities:
+            report.update(await import_cities(neo4j_driver, payload.cities))
+        if payload.edges:
+            report.update(await import_edges(
+                neo4j_driver, [(edge.city_a, edge.city_b, edge.distance) for edge in payload.edges]
+            ))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error importing city graph: {str(e)}")
+    finally:
+        # Partial imports are committed batch by batch, so resync the mirror either way
+        await llm_cache.invalidate_locations(await city_graph.load(neo4j_driver))
+    return report
+
 # ---------------------
 # Run the Application
 # ---------------------
@@ -0,0 +1,117 @@
+"""
+Time to turn database rows into a JSON response body for list endpoints,
+at 1k, 10k and 100k rows:
+
+- before: full documents (with `_id` and the password hash), built into
+  models in the handler, re-validated by FastAPI's response_model and
+  rendered with the standard JSONResponse
+- after: rows already trimmed by the read_models projection, shaped with
+  dump_rows and encoded with orjson
+
+Run from the repository root:
+    python benchmarks/bench_list_responses.py
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import BaseModel, EmailStr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from read_models import dump_rows, json_response, model_projection  # noqa: E402
+
+
+# Same fields as the response models in app2.py (importing app2 would open database clients)
+class UserOut(BaseModel):
+    id: str
+    name: str
+    email: EmailStr
+    role: str
+    location: str
+
+
+class ListingModel(BaseModel):
+    id: Optional[str] = None
+    title: str
+    description: str
+    category: str
+    quantity: int
+    expiry_date: datetime
+    location: str
+    image_url: Optional[str] = "None"
+    created_at: Optional[datetime] = None
+
+
+def user_doc(i):
+    return {
+        "_id": ObjectId(),
+        "id": str(i),
+        "name": f"User {i}",
+        "email": f"user{i}@example.com",
+        "password": "$2b$12$" + "x" * 53,
+        "role": "foodbank",
+        "location": "Chennai",
+        "created_at": datetime(2026, 1, 1),
+    }
+
+
+def listing_doc(i):
+    return {
+        "_id": ObjectId(),
+        "id": str(i),
+        "supermarket_id": "7",
+        "title": f"Item {i}",
+        "description": "Fresh produce, boxed",
+        "category": "produce",
+        "quantity": i % 200,
+        "expiry_date": datetime(2026, 1, 1) + timedelta(hours=i % 720),
+        "location": "Chennai",
+        "image_url": "None",
+        "created_at": datetime(2026, 1, 1),
+    }
+
+
+def project(doc, projection):
+    return {k: v for k, v in doc.items() if projection.get(k)}
+
+
+async def before(model, docs):
+    field = create_model_field(name="Response", type_=List[model], mode="serialization")
+    content = [model(**doc) for doc in docs]
+    serialized = await serialize_response(field=field, response_content=content)
+    return JSONResponse(serialized).body
+
+
+async def after(model, docs):
+    return json_response(dump_rows(model, docs)).body
+
+
+async def measure(fn, *args):
+    start = time.perf_counter()
+    body = await fn(*args)
+    return time.perf_counter() - start, len(body)
+
+
+async def main(sizes=(1000, 10000, 100000)):
+    print(f"{'endpoint':<10} {'rows':>8} {'before ms':>11} {'after ms':>10} {'speedup':>8} {'bytes before/after':>20}")
+    for model, make_doc, label in ((UserOut, user_doc, "users"), (ListingModel, listing_doc, "listings")):
+        projection = model_projection(model)
+        for size in sizes:
+            full = [make_doc(i) for i in range(size)]
+            projected = [project(doc, projection) for doc in full]
+            before_s, before_bytes = await measure(before, model, full)
+            after_s, after_bytes = await measure(after, model, projected)
+            print(f"{label:<10} {size:>8,} {before_s * 1000:>11.1f} {after_s * 1000:>10.1f} "
+                  f"{before_s / after_s:>7.1f}x {before_bytes:>10,}/{after_bytes:,}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+"""
+Rows per second for bulk listing import (listing_import.py) on a synthetic
+file, CSV and NDJSON, compared with the one-listing-per-request path
+(validate + insert_one per row).
+
+By default rows go to an in-memory sink, which measures parsing, coercion
+and validation. Pass a MongoDB URI to write to a scratch collection
+(dropped afterwards) and include the database round trips:
+
+Run from the repository root:
+    python benchmarks/bench_listing_import.py [rows] [mongodb://localhost:27017]
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_schema_validation import parse_schema  # noqa: E402
+from listing_import import coerce_listing, import_listings, iter_rows  # noqa: E402
+from schema_validators import compile_schema  # noqa: E402
+
+# Every 50th row is invalid, to exercise the per-row error path
+BAD_ROW_EVERY = 50
+COLUMNS = ["title", "description", "category", "quantity", "expiry_date", "location"]
+
+
+def synthetic_rows(count):
+    base = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        quantity = "lots" if i % BAD_ROW_EVERY == BAD_ROW_EVERY - 1 else i % 200 + 1
+        yield {
+            "title": f"Item {i}",
+            "description": "Fresh produce, boxed",
+            "category": ("produce", "dairy", "bakery")[i % 3],
+            "quantity": quantity,
+            "expiry_date": (base + timedelta(hours=i % 720)).isoformat(),
+            "location": ("Chennai", "Madurai", "Coimbatore")[i % 3],
+        }
+
+
+def csv_file(count):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(synthetic_rows(count))
+    return out.getvalue().encode("utf-8")
+
+
+def ndjson_file(count):
+    return "".join(json.dumps(row) + "\n" for row in synthetic_rows(count)).encode("utf-8")
+
+
+class SinkCollection:
+    """Stands in for a collection when no MongoDB URI is given."""
+
+    def __init__(self):
+        self.count = 0
+
+    async def insert_many(self, docs, ordered=True):
+        self.count += len(docs)
+
+    async def insert_one(self, doc):
+        self.count += 1
+
+    async def drop(self):
+        pass
+
+
+def reader(data):
+    stream = io.BytesIO(data)
+
+    async def read(size):
+        return stream.read(size)
+    return read
+
+
+def id_counter():
+    n = 0
+
+    async def next_id():
+        nonlocal n
+        n += 1
+        return str(n)
+    return next_id
+
+
+async def bulk(label, data, fmt, count, validator, collection):
+    next_id = id_counter()
+    start = time.perf_counter()
+    report = await import_listings(iter_rows(reader(data), fmt), validator, collection, next_id, "1")
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {count / elapsed:>12,.0f} rows/s  "
+          f"(inserted {report['inserted']:,}, failed {report['failed']:,})")
+
+
+async def per_row(label, data, count, validator, collection):
+    next_id = id_counter()
+    start = time.perf_counter()
+    async for _, row in iter_rows(reader(data), "ndjson"):
+        try:
+            doc = coerce_listing(row, validator.field_types)
+            validator(doc)
+        except (ValueError, TypeError):
+            continue
+        doc["id"] = await next_id()
+        await collection.insert_one(doc)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {count / elapsed:>12,.0f} rows/s")
+
+
+async def main(count, mongo_uri=None):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    validator = compile_schema(parse_schema(os.path.join(root, "schema.xml"))).mongo_validator("listings")
+
+    if mongo_uri:
+        import motor.motor_asyncio
+        collection = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri).bench.listings_import
+    else:
+        collection = SinkCollection()
+
+    csv_data = csv_file(count)
+    ndjson_data = ndjson_file(count)
+    print(f"{count:,} rows, CSV {len(csv_data) / 1e6:.1f} MB, NDJSON {len(ndjson_data) / 1e6:.1f} MB, "
+          f"{'MongoDB' if mongo_uri else 'in-memory sink'}")
+    try:
+        await per_row("per row (insert_one)", ndjson_data, count, validator, collection)
+        await collection.drop()
+        await bulk("bulk CSV (insert_many)", csv_data, "csv", count, validator, collection)
+        await collection.drop()
+        await bulk("bulk NDJSON (insert_many)", ndjson_data, "ndjson", count, validator, collection)
+    finally:
+        await collection.drop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+        sys.argv[2] if len(sys.argv) > 2 else None,
+    ))
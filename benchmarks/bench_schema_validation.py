@@ -0,0 +1,116 @@
+"""
+Validations per second for the old per-call validate_mongo_data and the
+compiled validators from schema_validators.py.
+
+Run from the repository root:
+    python benchmarks/bench_schema_validation.py
+"""
+import inspect
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schema_validators import compile_schema  # noqa: E402
+
+
+def parse_schema(xml_file):
+    """Build the same dict shape as app2.load_schema() without the debug output."""
+    root = ET.parse(xml_file).getroot()
+    schema = {"MongoDB": {}}
+    for db_elem in root.findall("./MongoDB/Database"):
+        collections = schema["MongoDB"][db_elem.get("name")] = {}
+        for col in db_elem.findall("./Collection"):
+            collections[col.get("name")] = {f.get("name"): f.get("type") for f in col.findall("./Field")}
+    for db_elem in root.findall("./Neo4j/Database"):
+        schema[db_elem.get("name")] = {
+            "Nodes": {n.get("name"): {p.get("name"): p.get("type") for p in n.findall("./Property")} for n in db_elem.findall("./Node")},
+            "Relationships": {r.get("name"): {p.get("name"): p.get("type") for p in r.findall("./Property")} for r in db_elem.findall("./Relationship")},
+        }
+    return schema
+
+
+# Copy of the validation path as it was before compiled validators
+def check_type(value, expected_type):
+    if expected_type == "string":
+        return isinstance(value, str)
+    elif expected_type == "integer":
+        return isinstance(value, int)
+    elif expected_type == "float":
+        return isinstance(value, float)
+    elif expected_type == "boolean":
+        return isinstance(value, bool)
+    elif expected_type == "datetime":
+        return isinstance(value, datetime)
+    else:
+        raise ValueError(f"Unknown type {expected_type}")
+
+
+def legacy_validate_mongo_data(schema_root, collection_name, data, out):
+    caller = inspect.stack()[1].function
+    print(f"[DEBUG] Called from {caller}: Validating MongoDB data for collection: {collection_name}", file=out)
+    if "MongoDB" not in schema_root or "inventory_app" not in schema_root["MongoDB"] or collection_name not in schema_root["MongoDB"]["inventory_app"]:
+        raise ValueError(f"Collection '{collection_name}' is not defined in the schema for database 'inventory_app'.")
+    schema = schema_root["MongoDB"]["inventory_app"][collection_name]
+    for key, value in data.items():
+        if key not in schema:
+            raise ValueError(f"Invalid field '{key}' for collection '{collection_name}'.")
+        expected_type = schema[key]
+        if not check_type(value, expected_type):
+            raise TypeError(f"Incorrect type for '{key}'. Expected '{expected_type}', got '{type(value).__name__}'.")
+    print("[DEBUG] MongoDB Validation passed!", file=out)
+    return True
+
+
+def sample_listing(i):
+    now = datetime.now(timezone.utc)
+    return {
+        "id": str(i),
+        "title": f"Item {i}",
+        "description": "Fresh produce",
+        "category": "produce",
+        "quantity": i % 50,
+        "expiry_date": now,
+        "location": "Chennai",
+        "image_url": "None",
+        "created_at": now,
+    }
+
+
+def rate(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {count / elapsed:>14,.0f} validations/s")
+
+
+def main(count=20000):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    schema = parse_schema(os.path.join(root, "schema.xml"))
+    compiled = compile_schema(schema)
+    docs = [sample_listing(i) for i in range(count)]
+
+    with open(os.devnull, "w") as devnull:
+        def legacy():
+            for doc in docs:
+                legacy_validate_mongo_data(schema, "listings", doc, devnull)
+        rate("before (per-call)", count, legacy)
+
+    validator = compiled.mongo_validator("listings")
+
+    def per_doc():
+        for doc in docs:
+            validator(doc)
+    rate("after (compiled, per doc)", count, per_doc)
+
+    def batch():
+        errors = validator.validate_many(docs)
+        assert not errors
+    rate("after (compiled, batch)", count, batch)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
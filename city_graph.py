@@ -0,0 +1,264 @@
+import asyncio
+import hashlib
+import heapq
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+# Pending edges kept outside the CSR arrays before they are folded in
+COMPACT_THRESHOLD = 256
+
+
+class CityGraph:
+    """
+    In-memory read model of the City / NEIGHBOR_OF graph.
+
+    Adjacency is stored CSR-style: city i's neighbors are
+    targets[offsets[i]:offsets[i + 1]] with matching distances. Edges added
+    after the last build go into a small overlay that is compacted into the
+    arrays once it grows past COMPACT_THRESHOLD, so single inserts stay cheap.
+    Every edge is stored in both directions, like the relationships written
+    by create_neighbor_relationship; when Neo4j holds different distances
+    for a->b and b->a, both directions get the shorter one.
+
+    add_city / add_edge calls made while a reload is reading Neo4j are
+    recorded and replayed on the fresh snapshot before it replaces this one,
+    so they are not lost until the next consistency check.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.offsets = array("l", [0])
+        self.targets = array("l")
+        self.distances = array("d")
+        self._pending: Dict[int, Dict[int, float]] = {}
+        self._pending_count = 0
+        self.loaded = False
+        # One list of (method, args) per reload in progress
+        self._journals: List[List[Tuple[str, tuple]]] = []
+
+    # -- building -----------------------------------------------------------
+
+    @classmethod
+    def build(cls, names: Iterable[str], edges: Iterable[Tuple[str, str, Optional[float]]]) -> "CityGraph":
+        graph = cls()
+        for name in names:
+            graph._add_node(name)
+        adjacency: Dict[int, Dict[int, float]] = {}
+        for a, b, distance in edges:
+            ia, ib = graph._add_node(a), graph._add_node(b)
+            if ia == ib:
+                continue
+            value = float("nan") if distance is None else float(distance)
+            # a->b and b->a may disagree; keep the shorter one so the result does not depend on read order
+            current = adjacency.get(ia, {}).get(ib)
+            if current is not None and (value != value or current < value):
+                value = current
+            adjacency.setdefault(ia, {})[ib] = value
+            adjacency.setdefault(ib, {})[ia] = value
+        graph._rebuild(adjacency)
+        graph.loaded = True
+        return graph
+
+    def _add_node(self, name: str) -> int:
+        i = self.index.get(name)
+        if i is None:
+            i = len(self.names)
+            self.names.append(name)
+            self.index[name] = i
+        return i
+
+    def _rebuild(self, adjacency: Dict[int, Dict[int, float]]):
+        offsets = array("l", [0])
+        targets = array("l")
+        distances = array("d")
+        for i in range(len(self.names)):
+            for target, distance in adjacency.get(i, {}).items():
+                targets.append(target)
+                distances.append(distance)
+            offsets.append(len(targets))
+        self.offsets, self.targets, self.distances = offsets, targets, distances
+        self._pending = {}
+        self._pending_count = 0
+
+    def _adjacency(self) -> Dict[int, Dict[int, float]]:
+        adjacency: Dict[int, Dict[int, float]] = {}
+        for i in range(len(self.offsets) - 1):
+            row = adjacency.setdefault(i, {})
+            for k in range(self.offsets[i], self.offsets[i + 1]):
+                row[self.targets[k]] = self.distances[k]
+        for i, row in self._pending.items():
+            merged = adjacency.setdefault(i, {})
+            for target, distance in row.items():
+                merged.setdefault(target, distance)
+        return adjacency
+
+    def compact(self):
+        if self._pending_count:
+            self._rebuild(self._adjacency())
+
+    def replace_with(self, other: "CityGraph"):
+        """Adopt another graph's arrays in one step (used after a reload)."""
+        self.names, self.index = other.names, other.index
+        self.offsets, self.targets, self.distances = other.offsets, other.targets, other.distances
+        self._pending, self._pending_count = other._pending, other._pending_count
+        self.loaded = other.loaded
+
+    # -- incremental updates ------------------------------------------------
+
+    def _record(self, method: str, *args):
+        for journal in self._journals:
+            journal.append((method, args))
+
+    def add_city(self, name: str):
+        self._record("add_city", name)
+        self._add_node(name)
+
+    def _has_edge(self, ia: int, ib: int) -> bool:
+        if ia < len(self.offsets) - 1:
+            for k in range(self.offsets[ia], self.offsets[ia + 1]):
+                if self.targets[k] == ib:
+                    return True
+        return ib in self._pending.get(ia, {})
+
+    def add_edge(self, city_a: str, city_b: str, distance: float) -> bool:
+        """
+        Mirror a NEIGHBOR_OF MERGE: both cities must already exist and an
+        existing edge keeps its distance (ON CREATE SET). Returns True if added.
+        """
+        self._record("add_edge", city_a, city_b, distance)
+        ia, ib = self.index.get(city_a), self.index.get(city_b)
+        if ia is None or ib is None or ia == ib:
+            return False
+        added = False
+        for src, dst in ((ia, ib), (ib, ia)):
+            if not self._has_edge(src, dst):
+                self._pending.setdefault(src, {})[dst] = float(distance)
+                self._pending_count += 1
+                added = True
+        if self._pending_count > COMPACT_THRESHOLD:
+            self.compact()
+        return added
+
+    # -- reads --------------------------------------------------------------
+
+    def neighbors(self, name: str) -> List[Tuple[str, Optional[float]]]:
+        """(neighbor name, distance) pairs for a city; empty for unknown cities."""
+        i = self.index.get(name)
+        if i is None:
+            return []
+        result = []
+        if i < len(self.offsets) - 1:
+            for k in range(self.offsets[i], self.offsets[i + 1]):
+                distance = self.distances[k]
+                result.append((self.names[self.targets[k]], None if distance != distance else distance))
+        for target, distance in self._pending.get(i, {}).items():
+            result.append((self.names[target], None if distance != distance else distance))
+        return result
+
+    def shortest_distances(self, source: str, max_distance: float) -> Dict[str, float]:
+        """
+        Dijkstra from `source` over NEIGHBOR_OF distances, stopping at
+        `max_distance` km. Returns {city: total distance} including the source
+        at 0. Edges without a distance are not traversed.
+        """
+        start = self.index.get(source)
+        if start is None:
+            return {}
+        best = {start: 0.0}
+        heap = [(0.0, start)]
+        while heap:
+            dist, i = heapq.heappop(heap)
+            if dist > best.get(i, float("inf")):
+                continue
+            for neighbor_name, edge in self.neighbors(self.names[i]):
+                if edge is None or edge < 0:
+                    continue
+                total = dist + edge
+                j = self.index[neighbor_name]
+                if total <= max_distance and total < best.get(j, float("inf")):
+                    best[j] = total
+                    heapq.heappush(heap, (total, j))
+        return {self.names[i]: d for i, d in best.items()}
+
+    def adjacency_by_name(self) -> Dict[str, List[str]]:
+        return {name: [n for n, _ in self.neighbors(name)] for name in self.names}
+
+    def edge_count(self) -> int:
+        return len(self.targets) + self._pending_count
+
+    def changed_cities(self, other: "CityGraph") -> Set[str]:
+        """Cities added, removed, or with different neighbors or distances in `other`."""
+        changed = set(self.names) ^ set(other.names)
+        for name in set(self.names) & set(other.names):
+            if sorted(self.neighbors(name), key=str) != sorted(other.neighbors(name), key=str):
+                changed.add(name)
+        return changed
+
+    def fingerprint(self) -> str:
+        """Digest of sorted nodes and edges, so it does not depend on read or insertion order."""
+        items = sorted(self.names)
+        items += sorted(f"{a}->{b}:{d}" for a in self.names for b, d in self.neighbors(a))
+        return hashlib.sha256("\n".join(items).encode("utf-8")).hexdigest()
+
+    # -- Neo4j --------------------------------------------------------------
+
+    @classmethod
+    async def from_neo4j(cls, driver) -> "CityGraph":
+        async def _read(tx):
+            names_result = await tx.run("MATCH (c:City) RETURN c.name AS name")
+            names = [record["name"] async for record in names_result]
+            edges_result = await tx.run(
+                "MATCH (a:City)-[r:NEIGHBOR_OF]->(b:City) RETURN a.name AS a, b.name AS b, r.distance AS distance"
+            )
+            edges = [(record["a"], record["b"], record["distance"]) async for record in edges_result]
+            return names, edges
+
+        async with driver.session() as session:
+            names, edges = await session.execute_read(_read)
+        return cls.build(names, edges)
+
+    async def _fresh_snapshot(self, driver) -> "CityGraph":
+        """Read Neo4j, then replay local updates made during the read onto the result."""
+        journal: List[Tuple[str, tuple]] = []
+        self._journals.append(journal)
+        try:
+            fresh = await CityGraph.from_neo4j(driver)
+        finally:
+            self._journals.remove(journal)
+        for method, args in journal:
+            getattr(fresh, method)(*args)
+        return fresh
+
+    async def load(self, driver) -> Set[str]:
+        """Replace the mirror with Neo4j's graph; returns the cities that changed."""
+        fresh = await self._fresh_snapshot(driver)
+        changed = self.changed_cities(fresh)
+        self.replace_with(fresh)
+        print(f"[DEBUG] City graph loaded: {len(self.names)} cities, {self.edge_count()} directed edges")
+        return changed
+
+    async def check_consistency(self, driver, on_reload=None) -> bool:
+        """Compare with Neo4j and reload on drift. Returns True when already consistent."""
+        fresh = await self._fresh_snapshot(driver)
+        if fresh.fingerprint() == self.fingerprint():
+            return True
+        print("[DEBUG] City graph drifted from Neo4j, reloading")
+        changed = self.changed_cities(fresh)
+        self.replace_with(fresh)
+        if on_reload is not None:
+            await on_reload(changed)
+        return False
+
+    async def run_consistency_checks(self, driver, interval: float, on_reload=None):
+        """
+        Background loop for the lifespan hook; `on_reload(changed_cities)` is
+        awaited after a drift reload. Errors are logged and retried next tick.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.check_consistency(driver, on_reload)
+            except Exception as e:
+                print(f"[DEBUG] City graph consistency check failed: {str(e)}")
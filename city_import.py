@@ -0,0 +1,143 @@
+import asyncio
+import csv
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# Rows sent per UNWIND statement; each batch is its own write transaction
+CITY_IMPORT_BATCH_SIZE = int(os.environ.get("CITY_IMPORT_BATCH_SIZE", "1000"))
+
+# MERGE on the unique City.name constraint, so re-running an import is a no-op
+MERGE_CITIES = """
+UNWIND $names AS name
+MERGE (:City {name: name})
+"""
+
+# Same semantics as create_neighbor_relationship: both directions, an existing
+# edge keeps its distance. Rows whose cities are missing are dropped by MATCH.
+MERGE_EDGES = """
+UNWIND $edges AS edge
+MATCH (a:City {name: edge.a}), (b:City {name: edge.b})
+MERGE (a)-[r:NEIGHBOR_OF]->(b)
+ON CREATE SET r.distance = edge.distance
+MERGE (b)-[r2:NEIGHBOR_OF]->(a)
+ON CREATE SET r2.distance = edge.distance
+RETURN count(*) AS matched
+"""
+
+Progress = Callable[[str, int, int], None]
+
+
+def print_progress(kind: str, done: int, total: int):
+    print(f"[DEBUG] Imported {done}/{total} {kind}")
+
+
+def _batches(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def import_cities(driver, names: Iterable[str], batch_size: int = CITY_IMPORT_BATCH_SIZE,
+                        on_progress: Optional[Progress] = print_progress) -> Dict[str, int]:
+    """MERGE City nodes in UNWIND batches. Returns how many were new."""
+    unique = list(dict.fromkeys(name for name in names if name))
+    created = 0
+    done = 0
+
+    async def _write(tx, batch):
+        result = await tx.run(MERGE_CITIES, names=batch)
+        summary = await result.consume()
+        return summary.counters.nodes_created
+
+    async with driver.session() as session:
+        for batch in _batches(unique, batch_size):
+            created += await session.execute_write(_write, batch)
+            done += len(batch)
+            if on_progress is not None:
+                on_progress("cities", done, len(unique))
+    return {"cities": len(unique), "cities_created": created}
+
+
+async def import_edges(driver, edges: Iterable[Tuple[str, str, float]], batch_size: int = CITY_IMPORT_BATCH_SIZE,
+                       on_progress: Optional[Progress] = print_progress) -> Dict[str, int]:
+    """
+    MERGE NEIGHBOR_OF relationships (both directions) in UNWIND batches.
+    Edges naming a city that does not exist are skipped and counted.
+    """
+    rows = [{"a": a, "b": b, "distance": float(distance)} for a, b, distance in edges if a != b]
+    created = 0
+    matched = 0
+    done = 0
+
+    async def _write(tx, batch):
+        result = await tx.run(MERGE_EDGES, edges=batch)
+        record = await result.single()
+        summary = await result.consume()
+        return record["matched"], summary.counters.relationships_created
+
+    async with driver.session() as session:
+        for batch in _batches(rows, batch_size):
+            batch_matched, batch_created = await session.execute_write(_write, batch)
+            matched += batch_matched
+            created += batch_created
+            done += len(batch)
+            if on_progress is not None:
+                on_progress("edges", done, len(rows))
+    return {"edges": len(rows), "relationships_created": created, "edges_skipped": len(rows) - matched}
+
+
+def read_cities_file(path: str) -> List[str]:
+    """One city per line, or a CSV with a `name` column."""
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    if rows and rows[0] and rows[0][0].strip().lower() == "name":
+        rows = rows[1:]
+    return [row[0].strip() for row in rows if row and row[0].strip()]
+
+
+def read_edges_file(path: str) -> List[Tuple[str, str, float]]:
+    """CSV rows of city_a,city_b,distance (an optional header row is skipped)."""
+    edges = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for line_no, row in enumerate(csv.reader(f), start=1):
+            if not row or not "".join(row).strip():
+                continue
+            if len(row) != 3:
+                raise ValueError(f"{path}:{line_no}: expected city_a,city_b,distance")
+            try:
+                distance = float(row[2])
+            except ValueError:
+                if line_no == 1:
+                    continue
+                raise ValueError(f"{path}:{line_no}: invalid distance {row[2]!r}")
+            edges.append((row[0].strip(), row[1].strip(), distance))
+    return edges
+
+
+async def _main(cities_path: Optional[str], edges_path: Optional[str], batch_size: int):
+    from neo4j import AsyncGraphDatabase
+
+    driver = AsyncGraphDatabase.driver(
+        os.environ.get("NEO4J_URI", "bolt://localhost:7687"),
+        auth=(os.environ.get("NEO4J_USER", "neo4j"), os.environ.get("NEO4J_PASSWORD", "hydridhydrid")),
+    )
+    try:
+        if cities_path:
+            print(await import_cities(driver, read_cities_file(cities_path), batch_size))
+        if edges_path:
+            print(await import_edges(driver, read_edges_file(edges_path), batch_size))
+    finally:
+        await driver.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk-load City nodes and NEIGHBOR_OF edges into Neo4j.")
+    parser.add_argument("--cities", help="file with one city name per line (or a CSV with a name column)")
+    parser.add_argument("--edges", help="CSV file of city_a,city_b,distance")
+    parser.add_argument("--batch-size", type=int, default=CITY_IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    if not args.cities and not args.edges:
+        parser.error("nothing to import; pass --cities and/or --edges")
+    asyncio.run(_main(args.cities, args.edges, args.batch_size))
@@ -92,9 +92,9 @@ function AdminPanel() {
             }
             try {
                 const [usersRes, listingsRes, requestsRes, statsRes] = await Promise.all([
-                    axios.get(`${BASE_URL}/admin/users`, { headers: { Authorization: `Bearer ${token}` } }),
-                    axios.get(`${BASE_URL}/admin/listings`, { headers: { Authorization: `Bearer ${token}` } }),
-                    axios.get(`${BASE_URL}/admin/requests`, { headers: { Authorization: `Bearer ${token}` } }),
+                    axios.get(`${BASE_URL}/admin/users?limit=20`, { headers: { Authorization: `Bearer ${token}` } }),
+                    axios.get(`${BASE_URL}/admin/listings?limit=20`, { headers: { Authorization: `Bearer ${token}` } }),
+                    axios.get(`${BASE_URL}/admin/requests?limit=20`, { headers: { Authorization: `Bearer ${token}` } }),
                     axios.get(`${BASE_URL}/admin/stats`, { headers: { Authorization: `Bearer ${token}` } }),
                 ]);
                 setUsers(usersRes.data);
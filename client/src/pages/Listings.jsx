@@ -5,16 +5,22 @@ const BASE_URL = "http://localhost:8000/api";
 
 function Listings() {
     const [listings, setListings] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+
+    // Listings come back soonest-expiring first; X-Next-Cursor points at the next page
+    const fetchListings = async (cursor = null) => {
+        try {
+            const res = await axios.get(`${BASE_URL}/listings`, {
+                params: cursor ? { cursor } : {},
+            });
+            setListings((prev) => (cursor ? [...prev, ...res.data] : res.data));
+            setNextCursor(res.headers['x-next-cursor'] || null);
+        } catch (error) {
+            console.error("Error fetching listings", error);
+        }
+    };
 
     useEffect(() => {
-        const fetchListings = async () => {
-            try {
-                const res = await axios.get(`${BASE_URL}/listings`);
-                setListings(res.data);
-            } catch (error) {
-                console.error("Error fetching listings", error);
-            }
-        };
         fetchListings();
     }, []);
 
@@ -28,7 +34,7 @@ function Listings() {
                 {listings.length > 0 ? (
                     listings.map((listing) => (
                         <div
-                            key={listing.listing_id}
+                            key={listing.id}
                             className="bg-white/60 backdrop-blur-lg p-6 rounded-xl shadow-lg border border-white/50 transform transition duration-300 hover:scale-105"
                         >
                             <h3 className="font-bold text-xl text-gray-800">{listing.title}</h3>
@@ -46,6 +52,15 @@ function Listings() {
                     <p className="text-gray-600">No listings available.</p>
                 )}
             </div>
+
+            {nextCursor && (
+                <button
+                    className="mt-6 bg-gradient-to-r from-purple-600 to-blue-600 text-white px-6 py-2 rounded-lg shadow-lg transform transition hover:scale-105"
+                    onClick={() => fetchListings(nextCursor)}
+                >
+                    Load more
+                </button>
+            )}
         </div>
     );
 }
@@ -9,6 +9,7 @@ function MatchingAndNeo4j() {
     const [listingDetails, setListingDetails] = useState(null);
     const [matchingResponse, setMatchingResponse] = useState(null);
     const [matchingError, setMatchingError] = useState('');
+    const [streamingText, setStreamingText] = useState('');
     const [loadingListing, setLoadingListing] = useState(false);
 
     const token = localStorage.getItem('access_token');
@@ -37,19 +38,60 @@ function MatchingAndNeo4j() {
         fetchListingDetails();
     }, [listingId]);
 
+    // Parse "event: ...\ndata: ..." blocks from the server-sent events stream
+    const handleStreamEvent = (block) => {
+        let event = 'message';
+        let data = '';
+        for (const line of block.split('\n')) {
+            if (line.startsWith('event: ')) event = line.slice(7);
+            else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        if (!data) return;
+        const payload = JSON.parse(data);
+        if (event === 'chunk') {
+            setStreamingText((prev) => prev + payload.text);
+        } else if (event === 'result') {
+            setMatchingResponse(payload);
+            setStreamingText('');
+        } else if (event === 'error') {
+            setMatchingError(payload.detail || "Matching request failed");
+        }
+    };
+
     const handleMatchingSubmit = async (e) => {
         e.preventDefault();
         setMatchingError('');
         setMatchingResponse(null);
+        setStreamingText('');
         try {
-            const res = await axios.post(
-                `${BASE_URL}/matching`,
-                { listing_id: listingId },
-                { headers: { Authorization: `Bearer ${token}` } }
-            );
-            setMatchingResponse(res.data);
+            const res = await fetch(`${BASE_URL}/matching/stream`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    Authorization: `Bearer ${token}`,
+                },
+                body: JSON.stringify({ listing_id: listingId }),
+            });
+            if (!res.ok) {
+                const body = await res.json().catch(() => ({}));
+                setMatchingError(body.detail || "Matching request failed");
+                return;
+            }
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    handleStreamEvent(buffer.slice(0, boundary));
+                    buffer = buffer.slice(boundary + 2);
+                }
+            }
         } catch (err) {
-            setMatchingError(err.response?.data?.detail || "Matching request failed");
+            setMatchingError("Matching request failed");
         }
     };
 
@@ -136,6 +178,13 @@ function MatchingAndNeo4j() {
                     {matchingError && <div className="mt-4 text-red-600 text-center">{matchingError}</div>}
                 </section>
 
+                {streamingText && !matchingResponse && (
+                    <div className="mt-6 p-4 bg-gray-100 rounded-lg shadow">
+                        <h3 className="font-bold mb-2">Matching Result (streaming):</h3>
+                        <pre className="whitespace-pre-wrap text-sm">{streamingText}</pre>
+                    </div>
+                )}
+
                 {matchingResponse && (
                     <div className="mt-6 p-4 bg-gray-100 rounded-lg shadow">
                         <h3 className="font-bold mb-2">Matching Result:</h3>
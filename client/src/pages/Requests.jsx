@@ -6,18 +6,21 @@ const BASE_URL = "http://localhost:8000/api";
 
 function Requests() {
     const [requests, setRequests] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [message, setMessage] = useState('');
     const { auth } = useContext(AuthContext);
     const token = localStorage.getItem('access_token');
 
-    const fetchRequests = async () => {
+    // Requests come back newest first; X-Next-Cursor points at the next page
+    const fetchRequests = async (cursor = null) => {
         if (!token) return;
         try {
             const res = await axios.get(`${BASE_URL}/requests`, {
-                headers: { Authorization: `Bearer ${token}` }
+                headers: { Authorization: `Bearer ${token}` },
+                params: cursor ? { cursor } : {},
             });
-            console.log(res.data);
-            setRequests(res.data);
+            setRequests((prev) => (cursor ? [...prev, ...res.data] : res.data));
+            setNextCursor(res.headers['x-next-cursor'] || null);
         } catch (error) {
             console.error("Error fetching requests", error);
         }
@@ -51,7 +54,7 @@ function Requests() {
                         <p className="text-gray-500 text-center">No requests found.</p>
                     ) : (
                         requests.map((req) => (
-                            <div key={req.request_id} className="bg-white/80 p-6 rounded-lg shadow-md mb-4">
+                            <div key={req.id} className="bg-white/80 p-6 rounded-lg shadow-md mb-4">
                                 <p className="text-gray-700"><strong>Request ID:</strong> {req.id}</p>
                                 <p className="text-gray-700"><strong>Listing ID:</strong> {req.listing_id}</p>
                                 <p className="text-gray-700"><strong>Location:</strong> {req.location}</p>
@@ -86,6 +89,17 @@ function Requests() {
                             </div>
                         ))
                     )}
+
+                    {nextCursor && (
+                        <div className="text-center">
+                            <button
+                                className="bg-blue-600 text-white px-4 py-2 rounded-lg shadow-md hover:bg-blue-700 transition"
+                                onClick={() => fetchRequests(nextCursor)}
+                            >
+                                Load more
+                            </button>
+                        </div>
+                    )}
                 </div>
             </div>
         </div >
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+EXPORT_BATCH_SIZE = 1000
+# Bytes of output gathered before a chunk is written to the response
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def export_query(after: Optional[str]) -> Dict[str, Any]:
+    """Filter that resumes an export after the `_id` of the last row received."""
+    if not after:
+        return {}
+    try:
+        return {"_id": {"$gt": ObjectId(after)}}
+    except (InvalidId, TypeError) as e:
+        raise ValueError("Invalid 'after' value") from e
+
+
+def export_cursor(collection, fields: List[str], after: Optional[str] = None, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Cursor over a whole collection in `_id` order with only `fields` (plus
+    `_id`, used to resume) fetched from the server, in batches.
+    """
+    projection = {field: 1 for field in fields}
+    return collection.find(export_query(after), projection).sort("_id", 1).batch_size(batch_size)
+
+
+async def stream_ndjson(cursor, fields: List[str]) -> AsyncIterator[str]:
+    """One JSON object per line; `_id` is included as a string so a client can resume."""
+    lines = []
+    size = 0
+    async for doc in cursor:
+        row = {"_id": str(doc["_id"])}
+        for field in fields:
+            row[field] = doc.get(field)
+        line = json.dumps(row, default=_json_default) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield "".join(lines)
+            lines, size = [], 0
+    if lines:
+        yield "".join(lines)
+
+
+async def stream_csv(cursor, fields: List[str]) -> AsyncIterator[str]:
+    """CSV with a header row; `_id` is the first column so a client can resume."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    columns = ["_id"] + fields
+
+    def flush() -> str:
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return text
+
+    writer.writerow(columns)
+    yield flush()
+    async for doc in cursor:
+        row = [str(doc["_id"])]
+        for field in fields:
+            value = doc.get(field)
+            row.append(value.isoformat() if isinstance(value, datetime) else ("" if value is None else value))
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield flush()
+    remaining = flush()
+    if remaining:
+        yield remaining
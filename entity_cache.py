@@ -0,0 +1,105 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+ENTITY_CACHE_SIZE = int(os.environ.get("ENTITY_CACHE_SIZE", "5000"))
+ENTITY_CACHE_TTL = float(os.environ.get("ENTITY_CACHE_TTL", "60"))
+# Ids that were not found are remembered for a shorter time
+ENTITY_CACHE_NEGATIVE_TTL = float(os.environ.get("ENTITY_CACHE_NEGATIVE_TTL", "10"))
+
+# Stored for ids the loader did not find
+_MISSING = object()
+
+
+class EntityCache:
+    """
+    Read-through cache of documents by id: a bounded LRU whose entries
+    expire after `ttl` seconds, or `negative_ttl` for ids that were not
+    found. Concurrent misses for the same id share one load, and an
+    `invalidate` that lands while a load is in flight keeps its (possibly
+    stale) result out of the cache.
+
+    The cache is per process, so other workers see a write after at most
+    `ttl` seconds; writes in this process invalidate immediately.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[str], Awaitable[Optional[Dict[str, Any]]]],
+        max_entries: int = ENTITY_CACHE_SIZE,
+        ttl: float = ENTITY_CACHE_TTL,
+        negative_ttl: float = ENTITY_CACHE_NEGATIVE_TTL,
+    ):
+        self.name = name
+        self.loader = loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Task] = {}
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    async def get(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        """The document for `entity_id`, or None if it does not exist. Returns a copy."""
+        entry = self._entries.get(entity_id)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(entity_id)
+                if value is _MISSING:
+                    self.stats["negative_hits"] += 1
+                    return None
+                self.stats["hits"] += 1
+                return dict(value)
+            del self._entries[entity_id]
+            self.stats["expired"] += 1
+
+        self.stats["misses"] += 1
+        pending = self._loading.get(entity_id)
+        if pending is None:
+            pending = asyncio.create_task(self._load(entity_id))
+            self._loading[entity_id] = pending
+        value = await asyncio.shield(pending)
+        return None if value is None else dict(value)
+
+    async def _load(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = await self.loader(entity_id)
+        finally:
+            # An invalidate during the load detaches this task; its result is then not cached
+            current = self._loading.get(entity_id) is asyncio.current_task()
+            if current:
+                del self._loading[entity_id]
+        if not current:
+            return value
+        ttl = self.ttl if value is not None else self.negative_ttl
+        self._entries[entity_id] = (_MISSING if value is None else value, time.monotonic() + ttl)
+        self._entries.move_to_end(entity_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        return value
+
+    def invalidate(self, entity_id: str):
+        """Drop one id; call after every write to that entity (including creation)."""
+        if self._entries.pop(entity_id, None) is not None:
+            self.stats["invalidations"] += 1
+        self._loading.pop(entity_id, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._loading.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["negative_hits"] + self.stats["misses"]
+        hit_rate = (self.stats["hits"] + self.stats["negative_hits"]) / lookups if lookups else 0.0
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_rate": round(hit_rate, 4),
+        }
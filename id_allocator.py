@@ -0,0 +1,86 @@
+import asyncio
+import os
+from typing import Dict, List
+
+from pymongo import ReturnDocument
+
+
+# Default number of ids a worker reserves per round trip to the counters collection.
+ID_BLOCK_SIZE = int(os.environ.get("ID_BLOCK_SIZE", "50"))
+
+
+class IdAllocator:
+    """
+    Hands out sequential string ids backed by a MongoDB counters collection.
+
+    Each counter document looks like {"_id": "<collection>", "seq": <int>}.
+    A worker reserves a whole block of ids with one atomic $inc and serves
+    them from memory, so most inserts need no extra round trip and two
+    workers can never receive the same id. Ids left in a block when the
+    worker exits are simply skipped.
+    """
+
+    def __init__(self, counters_collection, block_size: int = ID_BLOCK_SIZE):
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+        self.counters = counters_collection
+        self.block_size = block_size
+        self._next: Dict[str, int] = {}
+        self._limit: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def _reserve_block(self, name: str):
+        counter = await self.counters.find_one_and_update(
+            {"_id": name},
+            {"$inc": {"seq": self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        end = counter["seq"]
+        self._next[name] = end - self.block_size + 1
+        self._limit[name] = end
+
+    async def next_id(self, name: str) -> str:
+        """Return the next id for `name` as a string, e.g. "42"."""
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if self._next.get(name, 1) > self._limit.get(name, 0):
+                await self._reserve_block(name)
+            value = self._next[name]
+            self._next[name] = value + 1
+        return str(value)
+
+
+async def max_numeric_id(collection) -> int:
+    """Return the largest numeric `id` stored in a collection (0 when empty)."""
+    pipeline = [
+        {"$project": {"n": {"$convert": {"input": "$id", "to": "long", "onError": None, "onNull": None}}}},
+        {"$group": {"_id": None, "max_id": {"$max": "$n"}}},
+    ]
+    result = await collection.aggregate(pipeline).to_list(length=1)
+    if not result or result[0]["max_id"] is None:
+        return 0
+    return int(result[0]["max_id"])
+
+
+async def seed_counters(db, collection_names: List[str], counters_name: str = "counters") -> Dict[str, int]:
+    """
+    Migration step: make every counter at least the current max id of its
+    collection. Uses $max so it is idempotent and never moves a counter back.
+    """
+    counters = db.get_collection(counters_name)
+    seeded = {}
+    for name in collection_names:
+        max_id = await max_numeric_id(db.get_collection(name))
+        await counters.update_one({"_id": name}, {"$max": {"seq": max_id}}, upsert=True)
+        seeded[name] = max_id
+        print(f"[DEBUG] Seeded counter '{name}' from max id {max_id}")
+    return seeded
+
+
+if __name__ == "__main__":
+    import motor.motor_asyncio
+
+    mongo_uri = os.environ.get("MONGO_DETAILS", "mongodb://localhost:27017")
+    mongo_client = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri)
+    asyncio.run(seed_counters(mongo_client.inventory_app, ["users", "listings", "requests"]))
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+
+def _parse_fields(fields: str) -> List[tuple]:
+    """Turn "role,-created_at" into [("role", 1), ("created_at", -1)]."""
+    keys = []
+    for field in fields.split(","):
+        field = field.strip()
+        if field.startswith("-"):
+            keys.append((field[1:], DESCENDING))
+        elif field:
+            keys.append((field, ASCENDING))
+    return keys
+
+
+def index_name(keys: List[tuple]) -> str:
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+def load_index_plan(xml_file: str = "schema.xml") -> Dict[str, Any]:
+    """
+    Build the index plan from schema.xml.
+
+    Every collection with an `id` field gets a unique index on `id` (all
+    lookups by id rely on it). Further MongoDB indexes come from the
+    <Index> elements and Neo4j constraints from the <Constraint> elements.
+    """
+    root = ET.parse(xml_file).getroot()
+    mongo: Dict[str, List[Dict[str, Any]]] = {}
+
+    for db_elem in root.findall("./MongoDB/Database"):
+        for collection in db_elem.findall("./Collection"):
+            field_names = [f.get("name") for f in collection.findall("./Field")]
+            if "id" in field_names:
+                mongo.setdefault(collection.get("name"), []).append({"keys": [("id", ASCENDING)], "unique": True})
+        for index in db_elem.findall("./Index"):
+            mongo.setdefault(index.get("collection"), []).append({
+                "keys": _parse_fields(index.get("fields")),
+                "unique": index.get("unique", "false") in ("true", "1"),
+            })
+
+    neo4j = []
+    for db_elem in root.findall("./Neo4j/Database"):
+        for constraint in db_elem.findall("./Constraint"):
+            neo4j.append({
+                "node": constraint.get("node"),
+                "property": constraint.get("property"),
+                "type": constraint.get("type", "unique"),
+            })
+
+    return {"mongo": mongo, "neo4j": neo4j}
+
+
+async def ensure_mongo_indexes(db, plan: Dict[str, Any], repair: bool = False) -> List[Dict[str, Any]]:
+    """
+    Create missing MongoDB indexes. An existing index with the same keys but
+    a different `unique` flag is reported as a mismatch; with `repair` it is
+    dropped and rebuilt as planned (Mongo cannot change the flag in place).
+    """
+    report = []
+    for collection_name, indexes in plan["mongo"].items():
+        collection = db.get_collection(collection_name)
+        existing = await collection.index_information()
+        existing_keys = {tuple(info["key"]): (name, bool(info.get("unique"))) for name, info in existing.items()}
+        for index in indexes:
+            keys = index["keys"]
+            entry = {"collection": collection_name, "index": index_name(keys), "unique": index["unique"]}
+            found = existing_keys.get(tuple(keys))
+            try:
+                if found is not None and found[1] == index["unique"]:
+                    entry["status"] = "exists"
+                elif found is not None and not repair:
+                    entry["status"] = f"mismatch: existing index {found[0]} has unique={found[1]}"
+                elif found is None:
+                    await collection.create_index(keys, name=index_name(keys), unique=index["unique"])
+                    entry["status"] = "created"
+                else:
+                    await collection.drop_index(found[0])
+                    try:
+                        await collection.create_index(keys, name=index_name(keys), unique=index["unique"])
+                    except OperationFailure:
+                        # Put the old index back so queries keep their index
+                        await collection.create_index(keys, name=found[0], unique=found[1])
+                        raise
+                    entry["status"] = "rebuilt"
+            except OperationFailure as e:
+                # e.g. duplicate values already stored; report instead of failing startup
+                entry["status"] = f"failed: {str(e)}"
+            report.append(entry)
+            print(f"[DEBUG] Index {collection_name}.{entry['index']}: {entry['status']}")
+    return report
+
+
+def _neo4j_statement(constraint: Dict[str, Any]) -> str:
+    node, prop = constraint["node"], constraint["property"]
+    name = f"{node.lower()}_{prop}_{constraint['type']}"
+    if constraint["type"] == "unique":
+        return f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{node}) REQUIRE n.{prop} IS UNIQUE"
+    return f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{node}) ON (n.{prop})"
+
+
+async def ensure_neo4j_constraints(driver, plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Create missing Neo4j constraints and indexes (IF NOT EXISTS keeps this idempotent)."""
+    report = []
+    async with driver.session() as session:
+        for constraint in plan["neo4j"]:
+            entry = {"node": constraint["node"], "property": constraint["property"], "type": constraint["type"]}
+            try:
+                result = await session.run(_neo4j_statement(constraint))
+                await result.consume()
+                entry["status"] = "ok"
+            except Exception as e:
+                entry["status"] = f"failed: {str(e)}"
+            report.append(entry)
+            print(f"[DEBUG] Neo4j {constraint['type']} on :{constraint['node']}({constraint['property']}): {entry['status']}")
+    return report
+
+
+async def mongo_index_stats(db, collection_names: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Usage counters for every index, from $indexStats."""
+    stats = {}
+    for collection_name in collection_names:
+        cursor = db.get_collection(collection_name).aggregate([{"$indexStats": {}}])
+        stats[collection_name] = [
+            {"name": s["name"], "ops": s["accesses"]["ops"], "since": s["accesses"]["since"]}
+            async for s in cursor
+        ]
+    return stats
+
+
+async def neo4j_index_stats(driver) -> List[Dict[str, Any]]:
+    async with driver.session() as session:
+        result = await session.run(
+            "SHOW INDEXES YIELD name, labelsOrTypes, properties, readCount, lastRead "
+            "RETURN name, labelsOrTypes, properties, readCount, lastRead"
+        )
+        return await result.data()
+
+
+async def _main(show_stats: bool, repair: bool):
+    import motor.motor_asyncio
+    from neo4j import AsyncGraphDatabase
+
+    mongo_client = motor.motor_asyncio.AsyncIOMotorClient(os.environ.get("MONGO_DETAILS", "mongodb://localhost:27017"))
+    db = mongo_client.inventory_app
+    driver = AsyncGraphDatabase.driver(
+        os.environ.get("NEO4J_URI", "bolt://localhost:7687"),
+        auth=(os.environ.get("NEO4J_USER", "neo4j"), os.environ.get("NEO4J_PASSWORD", "hydridhydrid")),
+    )
+    try:
+        plan = load_index_plan()
+        await ensure_mongo_indexes(db, plan, repair)
+        await ensure_neo4j_constraints(driver, plan)
+        if show_stats:
+            print(await mongo_index_stats(db, list(plan["mongo"])))
+            print(await neo4j_index_stats(driver))
+    finally:
+        await driver.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    asyncio.run(_main("--stats" in sys.argv, "--repair" in sys.argv))
@@ -0,0 +1,200 @@
+import codecs
+import csv
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+
+# Rows validated and written per insert_many call
+LISTING_IMPORT_CHUNK_ROWS = int(os.environ.get("LISTING_IMPORT_CHUNK_ROWS", "1000"))
+# Per-row errors returned to the client; further failures are only counted
+LISTING_IMPORT_MAX_ERRORS = int(os.environ.get("LISTING_IMPORT_MAX_ERRORS", "1000"))
+IMPORT_READ_SIZE = 64 * 1024
+
+IMPORT_FORMATS = ("csv", "ndjson")
+REQUIRED_LISTING_FIELDS = ("title", "description", "category", "quantity", "expiry_date", "location")
+# Set by the server for every imported row, never taken from the file
+SERVER_LISTING_FIELDS = ("id", "supermarket_id", "created_at")
+
+
+def detect_format(filename: Optional[str], fmt: Optional[str] = None) -> str:
+    if fmt:
+        fmt = fmt.lower()
+    elif filename and filename.lower().endswith(".csv"):
+        fmt = "csv"
+    elif filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        fmt = "ndjson"
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError("format must be 'csv' or 'ndjson'")
+    return fmt
+
+
+async def iter_lines(read: Callable[[int], Awaitable[bytes]]) -> AsyncIterator[Tuple[int, str]]:
+    """Yield (line number, text) for each non-blank line, reading the upload in fixed-size blocks."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    line_no = 0
+    while True:
+        block = await read(IMPORT_READ_SIZE)
+        pending += decoder.decode(block, final=not block)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            line_no += 1
+            line = line.rstrip("\r")
+            if line.strip():
+                yield line_no, line
+        if not block:
+            break
+    if pending.strip():
+        yield line_no + 1, pending.rstrip("\r")
+
+
+async def iter_rows(read: Callable[[int], Awaitable[bytes]], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Yield (row number, dict) per record, or (row number, exception) for a
+    record that cannot be parsed. CSV records must not span lines.
+    """
+    header: Optional[List[str]] = None
+    async for line_no, line in iter_lines(read):
+        if fmt == "ndjson":
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, ValueError(f"Invalid JSON: {str(e)}")
+                continue
+            if not isinstance(row, dict):
+                yield line_no, ValueError("Each line must be a JSON object")
+                continue
+            yield line_no, row
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield line_no, ValueError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        # Empty cells are treated as missing, so optional fields keep their defaults
+        yield line_no, {name: value for name, value in zip(header, values) if value != ""}
+
+
+def _parse_datetime(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+# Converters for text values (CSV cells, or JSON strings) into the schema's Python types
+COERCERS = {
+    int: lambda v: int(v.strip()),
+    float: lambda v: float(v.strip()),
+    bool: lambda v: v.strip().lower() in ("true", "1", "yes"),
+    datetime: _parse_datetime,
+}
+
+
+def coerce_listing(row: Dict[str, Any], field_types: Dict[str, type]) -> Dict[str, Any]:
+    """Turn a parsed row into a listing document (without server fields); raises ValueError."""
+    for field in SERVER_LISTING_FIELDS:
+        if field in row:
+            raise ValueError(f"Field '{field}' is set by the server")
+    missing = [field for field in REQUIRED_LISTING_FIELDS if field not in row]
+    if missing:
+        raise ValueError(f"Missing field(s): {', '.join(missing)}")
+    doc = {}
+    for key, value in row.items():
+        expected = field_types.get(key)
+        if isinstance(value, str) and expected in COERCERS:
+            try:
+                value = COERCERS[expected](value)
+            except ValueError:
+                raise ValueError(f"Invalid value for '{key}': {value!r}")
+        doc[key] = value
+    return doc
+
+
+class ImportReport:
+    def __init__(self, max_errors: int = LISTING_IMPORT_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def fail(self, row: int, error: Exception):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "error": str(error)})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+async def import_listings(
+    rows: AsyncIterator[Tuple[int, Any]],
+    validator,
+    collection,
+    next_id: Callable[[], Awaitable[str]],
+    owner_id: str,
+    chunk_rows: int = LISTING_IMPORT_CHUNK_ROWS,
+    max_errors: int = LISTING_IMPORT_MAX_ERRORS,
+    on_inserted: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """
+    Validate and insert listing rows in chunks. Each chunk is checked with
+    the compiled `validator` in one pass and written with one unordered
+    insert_many, so bad rows are reported without stopping the import.
+    """
+    report = ImportReport(max_errors)
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+
+    async def flush():
+        docs = [doc for _, doc in chunk]
+        failed = set()
+        for index, error in validator.validate_many(docs):
+            failed.add(index)
+            report.fail(chunk[index][0], error)
+        valid = [(row_no, doc) for index, (row_no, doc) in enumerate(chunk) if index not in failed]
+        chunk.clear()
+        if not valid:
+            return
+
+        now = datetime.now(timezone.utc)
+        for _, doc in valid:
+            doc["id"] = await next_id()
+            doc["supermarket_id"] = owner_id
+            doc["created_at"] = now
+        write_failed = set()
+        try:
+            await collection.insert_many([doc for _, doc in valid], ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                write_failed.add(write_error["index"])
+                report.fail(valid[write_error["index"]][0], ValueError(write_error.get("errmsg", "Write failed")))
+        inserted = [doc for index, (_, doc) in enumerate(valid) if index not in write_failed]
+        report.inserted += len(inserted)
+        if on_inserted is not None and inserted:
+            await on_inserted(inserted)
+
+    async for row_no, row in rows:
+        if isinstance(row, Exception):
+            report.fail(row_no, row)
+            continue
+        try:
+            chunk.append((row_no, coerce_listing(row, validator.field_types)))
+        except ValueError as e:
+            report.fail(row_no, e)
+            continue
+        if len(chunk) >= chunk_rows:
+            await flush()
+    if chunk:
+        await flush()
+    return report.as_dict()
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ASCENDING, ReplaceOne
+
+
+LISTING_SWEEP_INTERVAL = float(os.environ.get("LISTING_SWEEP_INTERVAL", "300"))
+LISTING_SWEEP_BATCH_SIZE = int(os.environ.get("LISTING_SWEEP_BATCH_SIZE", "500"))
+# A claim left by a sweep that died is ignored after this many seconds
+LISTING_SWEEP_CLAIM_TTL = float(os.environ.get("LISTING_SWEEP_CLAIM_TTL", "600"))
+
+OnArchived = Callable[[List[Dict[str, Any]], int], Awaitable[None]]
+
+
+class ListingArchiver:
+    """
+    Moves expired listings out of the hot `listings` collection into an
+    archive collection, in batches, and declines their pending requests.
+
+    Every worker runs its own sweep, so a batch is first claimed: listings
+    get an `archive_claim` with this sweep's token, and only listings this
+    sweep claimed are archived, deleted and reported. Claims older than
+    `claim_ttl` seconds (a sweep that died) can be taken over.
+
+    Each batch is copied to the archive (upsert by id) before it is deleted,
+    so an interrupted sweep never loses a listing and re-running it is safe.
+    The delete only removes listings that are still expired; a listing whose
+    expiry was extended mid-sweep stays live and its archive copy is dropped.
+    `on_archived(docs, declined)` is awaited after each batch so callers can
+    invalidate caches and counters.
+    """
+
+    def __init__(
+        self,
+        listings,
+        archive,
+        requests,
+        on_archived: Optional[OnArchived] = None,
+        batch_size: int = LISTING_SWEEP_BATCH_SIZE,
+        claim_ttl: float = LISTING_SWEEP_CLAIM_TTL,
+    ):
+        self.listings = listings
+        self.archive = archive
+        self.requests = requests
+        self.on_archived = on_archived
+        self.batch_size = batch_size
+        self.claim_ttl = claim_ttl
+        self._lock = asyncio.Lock()
+        self.sweeps = 0
+        self.archived_total = 0
+        self.declined_total = 0
+        self.last_sweep: Optional[Dict[str, Any]] = None
+
+    def _claimable(self) -> Dict[str, Any]:
+        stale = datetime.now(timezone.utc) - timedelta(seconds=self.claim_ttl)
+        return {"$or": [{"archive_claim": {"$exists": False}}, {"archive_claim.at": {"$lt": stale}}]}
+
+    async def _archive_batch(self, docs: List[Dict[str, Any]], cutoff: datetime, token: str) -> tuple:
+        ids = [doc["id"] for doc in docs]
+        await self.listings.update_many(
+            {"id": {"$in": ids}, "expiry_date": {"$lt": cutoff}, **self._claimable()},
+            {"$set": {"archive_claim": {"token": token, "at": datetime.now(timezone.utc)}}},
+        )
+        claimed = set(await self.listings.distinct("id", {"id": {"$in": ids}, "archive_claim.token": token}))
+        docs = [{k: v for k, v in doc.items() if k != "archive_claim"} for doc in docs if doc["id"] in claimed]
+        if not docs:
+            return [], 0
+
+        await self.archive.bulk_write(
+            [ReplaceOne({"id": doc["id"]}, {**doc, "archived_at": cutoff}, upsert=True) for doc in docs],
+            ordered=False,
+        )
+        await self.listings.delete_many(
+            {"id": {"$in": list(claimed)}, "archive_claim.token": token, "expiry_date": {"$lt": cutoff}}
+        )
+
+        still_live = set(await self.listings.distinct("id", {"id": {"$in": list(claimed)}}))
+        if still_live:
+            await self.archive.delete_many({"id": {"$in": list(still_live)}})
+            await self.listings.update_many(
+                {"id": {"$in": list(still_live)}, "archive_claim.token": token}, {"$unset": {"archive_claim": ""}}
+            )
+        archived = [doc for doc in docs if doc["id"] not in still_live]
+        if not archived:
+            return archived, 0
+
+        result = await self.requests.update_many(
+            {"listing_id": {"$in": [doc["id"] for doc in archived]}, "status": "pending"},
+            {"$set": {"status": "declined"}},
+        )
+        return archived, result.modified_count
+
+    async def sweep(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Archive every listing that expired before `now`; returns a report of the sweep."""
+        async with self._lock:
+            cutoff = now or datetime.now(timezone.utc)
+            token = uuid.uuid4().hex
+            start = time.perf_counter()
+            archived_count = 0
+            declined_count = 0
+            while True:
+                cursor = (
+                    self.listings.find({"expiry_date": {"$lt": cutoff}, **self._claimable()}, {"_id": 0})
+                    .sort([("expiry_date", ASCENDING), ("id", ASCENDING)])
+                    .limit(self.batch_size)
+                )
+                docs = await cursor.to_list(length=self.batch_size)
+                if not docs:
+                    break
+                archived, declined = await self._archive_batch(docs, cutoff, token)
+                archived_count += len(archived)
+                declined_count += declined
+                if self.on_archived is not None and archived:
+                    await self.on_archived(archived, declined)
+                if not archived:
+                    # Everything in this batch was extended mid-sweep or claimed by another worker; stop rather than spin
+                    break
+
+            report = {
+                "cutoff": cutoff,
+                "archived": archived_count,
+                "requests_declined": declined_count,
+                "duration_seconds": round(time.perf_counter() - start, 3),
+            }
+            self.sweeps += 1
+            self.archived_total += archived_count
+            self.declined_total += declined_count
+            self.last_sweep = report
+            if archived_count:
+                print(f"[DEBUG] Archived {archived_count} expired listings, declined {declined_count} requests "
+                      f"in {report['duration_seconds']}s")
+            return report
+
+    async def run(self, interval: float = LISTING_SWEEP_INTERVAL):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"[DEBUG] Listing archival sweep failed: {str(e)}")
+            await asyncio.sleep(interval)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "sweeps": self.sweeps,
+            "archived_total": self.archived_total,
+            "requests_declined_total": self.declined_total,
+            "last_sweep": self.last_sweep,
+        }
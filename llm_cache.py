@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", str(24 * 3600)))
+# Row cap for the SQLite tier; expired rows and then the soonest-expiring go first
+LLM_CACHE_DISK_SIZE = int(os.environ.get("LLM_CACHE_DISK_SIZE", "50000"))
+# Prune the SQLite tier once every this many writes
+LLM_CACHE_PRUNE_EVERY = int(os.environ.get("LLM_CACHE_PRUNE_EVERY", "200"))
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so formatting-only differences share a cache entry."""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def make_key(prompt: str, config: Dict[str, Any]) -> str:
+    payload = json.dumps({"prompt": normalize_prompt(prompt), "config": config}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache for LLM responses: a bounded in-memory LRU in front of a
+    local SQLite file. Entries expire after `ttl` seconds and are tagged with
+    the listing id and the listing locations, so they can be dropped when
+    the listing or the city graph around those locations changes. The
+    SQLite tier is pruned every `prune_every` writes: expired rows first,
+    then the soonest-expiring rows beyond `max_disk_entries`.
+    Disk access runs in a worker thread so the event loop never waits on it.
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        max_entries: int = LLM_CACHE_SIZE,
+        ttl: float = LLM_CACHE_TTL,
+        max_disk_entries: int = LLM_CACHE_DISK_SIZE,
+        prune_every: int = LLM_CACHE_PRUNE_EVERY,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.prune_every = prune_every
+        self._writes = 0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.stats = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0, "pruned": 0,
+        }
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, listing_id TEXT, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(llm_cache)")}
+            if "locations" not in columns:
+                # "|Chennai|Madurai|", so one location matches with LIKE '%|name|%'
+                self._conn.execute("ALTER TABLE llm_cache ADD COLUMN locations TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_listing ON llm_cache (listing_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_expires ON llm_cache (expires_at)")
+            self._conn.commit()
+            self._prune()
+        return self._conn
+
+    def _prune(self):
+        """Drop expired rows, then the soonest-expiring ones over the row cap. Caller holds the lock."""
+        conn = self._conn
+        removed = conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),)).rowcount
+        excess = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_disk_entries
+        if excess > 0:
+            removed += conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY expires_at LIMIT ?)", (excess,)
+            ).rowcount
+        conn.commit()
+        self.stats["pruned"] += removed
+
+    def _remember(self, key: str, listing_id: Optional[str], locations: frozenset, value: str, expires_at: float):
+        self._memory[key] = (listing_id, value, expires_at, locations)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _get_sync(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[2] > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+                self.stats["expired"] += 1
+
+            row = self._db().execute(
+                "SELECT listing_id, value, expires_at, locations FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                if row[2] > now:
+                    self._remember(key, row[0], frozenset((row[3] or "").strip("|").split("|")) - {""}, row[1], row[2])
+                    self.stats["disk_hits"] += 1
+                    return row[1]
+                self._db().execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._db().commit()
+                self.stats["expired"] += 1
+
+            self.stats["misses"] += 1
+            return None
+
+    def _set_sync(self, key: str, value: str, listing_id: Optional[str], locations: frozenset):
+        expires_at = time.time() + self.ttl
+        tags = "|" + "|".join(sorted(locations)) + "|" if locations else None
+        with self._lock:
+            self._remember(key, listing_id, locations, value, expires_at)
+            self._db().execute(
+                "INSERT OR REPLACE INTO llm_cache (key, listing_id, value, expires_at, locations) VALUES (?, ?, ?, ?, ?)",
+                (key, listing_id, value, expires_at, tags),
+            )
+            self._db().commit()
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune()
+
+    def _invalidate_listing_sync(self, listing_id: str):
+        with self._lock:
+            for key in [k for k, entry in self._memory.items() if entry[0] == listing_id]:
+                del self._memory[key]
+            self._db().execute("DELETE FROM llm_cache WHERE listing_id = ?", (listing_id,))
+            self._db().commit()
+            self.stats["invalidations"] += 1
+
+    def _invalidate_locations_sync(self, locations: frozenset):
+        with self._lock:
+            for key in [k for k, entry in self._memory.items() if entry[3] & locations]:
+                del self._memory[key]
+            for location in locations:
+                pattern = location.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                self._db().execute("DELETE FROM llm_cache WHERE locations LIKE ? ESCAPE '\\'", (f"%|{pattern}|%",))
+            self._db().commit()
+            self.stats["invalidations"] += 1
+
+    def _clear_sync(self):
+        with self._lock:
+            self._memory.clear()
+            self._db().execute("DELETE FROM llm_cache")
+            self._db().commit()
+            self.stats["invalidations"] += 1
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def set(self, key: str, value: str, listing_id: Optional[str] = None, locations: Iterable[str] = ()):
+        await asyncio.to_thread(self._set_sync, key, value, listing_id, frozenset(l for l in locations if l))
+
+    async def invalidate_listing(self, listing_id: str):
+        await asyncio.to_thread(self._invalidate_listing_sync, listing_id)
+
+    async def invalidate_locations(self, locations: Iterable[str]):
+        """Drop entries for listings in any of these cities (after a city graph change around them)."""
+        locations = frozenset(locations)
+        if locations:
+            await asyncio.to_thread(self._invalidate_locations_sync, locations)
+
+    async def clear(self):
+        await asyncio.to_thread(self._clear_sync)
+
+    def metrics(self) -> Dict[str, Any]:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "memory_entries": len(self._memory),
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import random
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+from google import genai
+from google.genai import errors, types
+
+
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "60"))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.5"))
+
+# HTTP status codes worth retrying
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """The LLM call failed after all retries."""
+
+
+class LLMTimeout(LLMError):
+    """The LLM call did not finish within its deadline."""
+
+
+def is_transient(exc: Exception) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    if isinstance(exc, errors.APIError):
+        return exc.code in TRANSIENT_STATUS_CODES
+    return False
+
+
+class LLMClient:
+    """
+    Long-lived async wrapper around the Gemini SDK.
+
+    - one genai.Client for the whole process (connection reuse)
+    - async streaming, so a slow response never blocks the event loop
+    - a semaphore caps in-flight calls at `max_concurrency`
+    - each call, retries included, has one deadline of `timeout` seconds
+    - transient failures are retried with full-jitter exponential backoff,
+      as long as no output has been streamed yet and time remains; the
+      concurrency slot is released while backing off
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        api_key: Optional[str] = None,
+        timeout: float = LLM_TIMEOUT,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base_delay: float = LLM_RETRY_BASE_DELAY,
+    ):
+        self.config = config
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self._client: Optional[genai.Client] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+
+    @property
+    def client(self) -> genai.Client:
+        if self._client is None:
+            self._client = genai.Client(api_key=self.api_key or os.environ.get("GEMINI_API_KEY"))
+        return self._client
+
+    def _request(self, prompt_text: str, max_output_tokens: Optional[int] = None):
+        contents = [
+            types.Content(
+                role="user",
+                parts=[types.Part.from_text(text=prompt_text)]
+            )
+        ]
+        generate_content_config = types.GenerateContentConfig(
+            temperature=self.config["temperature"],
+            top_p=self.config["top_p"],
+            top_k=self.config["top_k"],
+            max_output_tokens=max_output_tokens or self.config["max_output_tokens"],
+            response_mime_type="text/plain",
+        )
+        return contents, generate_content_config
+
+    async def _backoff(self, attempt: int, remaining: float):
+        delay = self.retry_base_delay * (2 ** attempt)
+        await asyncio.sleep(min(random.uniform(0, delay), remaining))
+
+    async def stream(self, prompt_text: str, max_output_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """Yield response text chunks as they arrive."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        contents, generate_content_config = self._request(prompt_text, max_output_tokens)
+        loop = asyncio.get_running_loop()
+
+        # One deadline for the whole call, retries included; it starts once a slot is first acquired
+        deadline: Optional[float] = None
+        attempt = 0
+        while True:
+            streamed = False
+            try:
+                async with self._semaphore:
+                    self.in_flight += 1
+                    try:
+                        if deadline is None:
+                            deadline = loop.time() + self.timeout
+                        remaining = deadline - loop.time()
+                        if remaining <= 0:
+                            raise asyncio.TimeoutError()
+                        chunks = await asyncio.wait_for(
+                            self.client.aio.models.generate_content_stream(
+                                model=self.config["model"],
+                                contents=contents,
+                                config=generate_content_config,
+                            ),
+                            timeout=remaining,
+                        )
+                        iterator = chunks.__aiter__()
+                        while True:
+                            remaining = deadline - loop.time()
+                            if remaining <= 0:
+                                raise asyncio.TimeoutError()
+                            try:
+                                chunk = await asyncio.wait_for(iterator.__anext__(), timeout=remaining)
+                            except StopAsyncIteration:
+                                return
+                            if chunk.text:
+                                streamed = True
+                                yield chunk.text
+                    finally:
+                        self.in_flight -= 1
+            except Exception as e:
+                remaining = deadline - loop.time() if deadline is not None else self.timeout
+                if streamed or not is_transient(e) or attempt >= self.max_retries or remaining <= 0:
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise LLMTimeout(f"LLM call exceeded {self.timeout}s") from e
+                    raise LLMError(f"LLM call failed: {str(e)}") from e
+                print(f"[DEBUG] Transient LLM error (attempt {attempt + 1}), retrying: {str(e)}")
+                # Back off without holding a concurrency slot
+                await self._backoff(attempt, remaining)
+                attempt += 1
+
+    async def generate(self, prompt_text: str, max_output_tokens: Optional[int] = None) -> str:
+        """Return the full response text."""
+        output = ""
+        async for text in self.stream(prompt_text, max_output_tokens):
+            output += text
+        return output
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"in_flight": self.in_flight, "max_concurrency": self.max_concurrency, "timeout": self.timeout}
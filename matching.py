@@ -0,0 +1,199 @@
+import json
+import math
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+
+# Candidates passed to the LLM after local ranking
+MATCHING_TOP_N = int(os.environ.get("MATCHING_TOP_N", "5"))
+# Upper bound on prompt size, in estimated tokens
+MATCHING_PROMPT_TOKEN_BUDGET = int(os.environ.get("MATCHING_PROMPT_TOKEN_BUDGET", "1500"))
+# Listings packed into one LLM prompt by the batch endpoint, and that prompt's budget
+MATCHING_BATCH_LISTINGS_PER_PROMPT = int(os.environ.get("MATCHING_BATCH_LISTINGS_PER_PROMPT", "10"))
+MATCHING_BATCH_TOKEN_BUDGET = int(os.environ.get("MATCHING_BATCH_TOKEN_BUDGET", "6000"))
+# Output tokens allowed per listing in a batched prompt
+MATCHING_BATCH_OUTPUT_TOKENS_PER_LISTING = int(os.environ.get("MATCHING_BATCH_OUTPUT_TOKENS_PER_LISTING", "256"))
+# Average travel speed used to drop food banks that cannot be reached before expiry
+MATCHING_TRAVEL_KMH = float(os.environ.get("MATCHING_TRAVEL_KMH", "40"))
+# Quantity one food bank is assumed to absorb; bigger lots keep more candidates
+MATCHING_UNITS_PER_BANK = int(os.environ.get("MATCHING_UNITS_PER_BANK", "50"))
+
+LLM_MAX_OUTPUT_TOKENS = int(os.environ.get("LLM_MAX_OUTPUT_TOKENS", "1024"))
+LLM_TEMPERATURE = float(os.environ.get("LLM_TEMPERATURE", "0.2"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def hours_until(expiry_date, now: Optional[datetime] = None) -> Optional[float]:
+    if not isinstance(expiry_date, datetime):
+        return None
+    now = now or datetime.now(timezone.utc)
+    if expiry_date.tzinfo is None:
+        expiry_date = expiry_date.replace(tzinfo=timezone.utc)
+    return (expiry_date - now).total_seconds() / 3600
+
+
+def rank_candidates(listing: Dict, candidates: List[Dict], top_n: int = MATCHING_TOP_N,
+                    now: Optional[datetime] = None) -> List[Dict]:
+    """
+    Deterministically rank food bank candidates ({"name", "location",
+    "distance", ...}) for a listing and keep the best few.
+
+    - Expiry: candidates farther than the listing can travel before it
+      expires are dropped; an expired listing has no candidates.
+    - Distance: nearer is better (unknown distances rank last).
+    - Quantity: larger lots keep more candidates, since they may be split.
+    """
+    hours_left = hours_until(listing.get("expiry_date"), now)
+    if hours_left is not None and hours_left <= 0:
+        return []
+    reachable_km = None if hours_left is None else hours_left * MATCHING_TRAVEL_KMH
+
+    kept = []
+    for candidate in candidates:
+        distance = candidate.get("distance")
+        if reachable_km is not None and distance is not None and distance > reachable_km:
+            continue
+        kept.append(candidate)
+    kept.sort(key=lambda c: (c.get("distance") is None, c.get("distance") or 0, c.get("name", "")))
+
+    quantity = listing.get("quantity") or 0
+    wanted = max(2, math.ceil(quantity / MATCHING_UNITS_PER_BANK)) if MATCHING_UNITS_PER_BANK > 0 else top_n
+    return kept[:min(top_n, wanted)]
+
+
+def candidate_line(candidate: Dict) -> str:
+    bank_id = f"ID: {candidate['id']}, " if candidate.get("id") else ""
+    return f"{candidate['name']} ({bank_id}City: {candidate['location']}, Distance: {candidate['distance']} km)"
+
+
+def build_prompt(listing: Dict, bank_info: List[str], token_budget: int = MATCHING_PROMPT_TOKEN_BUDGET) -> Tuple[str, int]:
+    """
+    Build the matching prompt, adding food bank lines (already ranked) until
+    the token budget is reached. Returns the prompt and how many lines fit.
+    """
+    header = f"""
+Listing Details:
+Title: {listing.get('title')}
+Description: {listing.get('description')}
+Category: {listing.get('category')}
+Quantity: {listing.get('quantity')}
+Expiry Date: {listing.get('expiry_date')}
+Location: {listing.get('location')}
+
+Nearby Food Banks:
+"""
+    footer = """
+
+Based on the above information, provide matching suggestions for 2 possible ideal food banks that could receive this listing. Return your answer as JSON with the keys:
+- "inventory_item_id": string,
+- "recommended_food_bank_id": string,
+- "explanation": string.
+"""
+    used = estimate_tokens(header) + estimate_tokens(footer)
+    lines = []
+    for line in bank_info:
+        cost = estimate_tokens(line) + 1
+        if lines and used + cost > token_budget:
+            break
+        lines.append(line)
+        used += cost
+    return header + "\n".join(lines) + footer, len(lines)
+
+
+def batch_listing_section(listing: Dict, bank_info: List[str], max_lines: int = MATCHING_TOP_N) -> str:
+    return f"""
+Listing ID: {listing.get('id')}
+Title: {listing.get('title')}
+Description: {listing.get('description')}
+Category: {listing.get('category')}
+Quantity: {listing.get('quantity')}
+Expiry Date: {listing.get('expiry_date')}
+Location: {listing.get('location')}
+Nearby Food Banks:
+{chr(10).join(bank_info[:max_lines])}
+"""
+
+
+BATCH_PROMPT_FOOTER = """
+For each listing above, provide matching suggestions for 2 possible ideal food banks from that listing's own food bank list. Return your answer as a single JSON array where every element has the keys:
+- "inventory_item_id": string (the Listing ID),
+- "recommended_food_bank_id": string,
+- "explanation": string.
+"""
+
+
+def build_batch_prompts(items: List[Tuple[Dict, List[str]]],
+                        token_budget: int = MATCHING_BATCH_TOKEN_BUDGET,
+                        max_listings: int = MATCHING_BATCH_LISTINGS_PER_PROMPT) -> List[Tuple[str, List[str]]]:
+    """
+    Pack several (listing, ranked bank lines) items into as few prompts as
+    the token budget allows. Returns (prompt, listing ids) pairs.
+    """
+    prompts = []
+    sections: List[str] = []
+    ids: List[str] = []
+    used = estimate_tokens(BATCH_PROMPT_FOOTER)
+    for listing, bank_info in items:
+        section = batch_listing_section(listing, bank_info)
+        cost = estimate_tokens(section)
+        if sections and (used + cost > token_budget or len(sections) >= max_listings):
+            prompts.append(("".join(sections) + BATCH_PROMPT_FOOTER, ids))
+            sections, ids = [], []
+            used = estimate_tokens(BATCH_PROMPT_FOOTER)
+        sections.append(section)
+        ids.append(listing.get("id"))
+        used += cost
+    if sections:
+        prompts.append(("".join(sections) + BATCH_PROMPT_FOOTER, ids))
+    return prompts
+
+
+def split_batch_output(parsed, listing_ids: List[str]) -> Dict[str, List[Dict]]:
+    """Group a parsed batch answer by inventory_item_id (listings with no suggestion get [])."""
+    by_listing: Dict[str, List[Dict]] = {listing_id: [] for listing_id in listing_ids}
+    if isinstance(parsed, dict):
+        parsed = [parsed]
+    if isinstance(parsed, list):
+        for item in parsed:
+            if isinstance(item, dict) and str(item.get("inventory_item_id")) in by_listing:
+                by_listing[str(item["inventory_item_id"])].append(item)
+    return by_listing
+
+
+def deterministic_result(listing: Dict, ranked: List[Dict]) -> str:
+    """
+    Result in the same JSON shape the LLM is asked for, used when ranking
+    leaves zero or one candidate and there is nothing for the LLM to decide.
+    """
+    if not ranked:
+        return json.dumps([])
+    best = ranked[0]
+    return json.dumps([{
+        "inventory_item_id": listing.get("id"),
+        "recommended_food_bank_id": best.get("id") or best["name"],
+        "explanation": f"{best['name']} in {best['location']} is the only reachable food bank "
+                       f"({best['distance']} km away) before the listing expires.",
+    }])
+
+
+def parse_llm_output(text: str):
+    """
+    Parse the LLM's JSON answer, tolerating a ```json fenced block.
+    Returns None when the text is not valid JSON.
+    """
+    content = text.strip()
+    if content.startswith("```json"):
+        content = content[len("```json"):].strip()
+    elif content.startswith("```"):
+        content = content[3:].strip()
+    if content.endswith("```"):
+        content = content[:content.rfind("```")].strip()
+    try:
+        return json.loads(content)
+    except ValueError:
+        return None
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+MATCHING_JOB_WORKERS = int(os.environ.get("MATCHING_JOB_WORKERS", "4"))
+MATCHING_JOB_QUEUE_SIZE = int(os.environ.get("MATCHING_JOB_QUEUE_SIZE", "1000"))
+# A running job whose heartbeat is older than this is assumed lost with its instance
+MATCHING_JOB_STALE_AFTER = float(os.environ.get("MATCHING_JOB_STALE_AFTER", "120"))
+MATCHING_JOB_RECOVERY_INTERVAL = float(os.environ.get("MATCHING_JOB_RECOVERY_INTERVAL", "60"))
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+class JobQueueFull(Exception):
+    """Raised when the in-process job queue has no room left."""
+
+
+class MatchingJobQueue:
+    """
+    In-process asyncio job system for matching.
+
+    Jobs are documents in the `matching_jobs` collection, so status and
+    results survive restarts. A bounded pool of worker tasks pulls job ids
+    from an asyncio.Queue and calls `runner(payload)`.
+
+    A worker claims a job by moving it from "queued" to "running" in one
+    update, so with several app instances each job runs once. While a job
+    runs, its `heartbeat_at` is refreshed every `stale_after / 3` seconds.
+    Periodically (and on start) running jobs whose heartbeat is older than
+    `stale_after` are put back to "queued", and queued jobs not already
+    waiting here are queued. Jobs interrupted by `stop()` go straight back
+    to "queued".
+    """
+
+    def __init__(
+        self,
+        collection,
+        runner: Callable[[Dict[str, Any]], Awaitable[Any]],
+        next_id: Callable[[], Awaitable[str]],
+        workers: int = MATCHING_JOB_WORKERS,
+        max_queue: int = MATCHING_JOB_QUEUE_SIZE,
+        stale_after: float = MATCHING_JOB_STALE_AFTER,
+    ):
+        self.collection = collection
+        self.runner = runner
+        self.next_id = next_id
+        self.workers = workers
+        self.stale_after = stale_after
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._tasks: List[asyncio.Task] = []
+        # Queue slots held by submits that are still storing their job
+        self._reserved = 0
+        # Job ids currently in the local queue
+        self._pending: set = set()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        # Recent wait and run times in seconds, for the metrics endpoint
+        self._wait_times: deque = deque(maxlen=500)
+        self._run_times: deque = deque(maxlen=500)
+
+    def _has_room(self) -> bool:
+        return self._queue.maxsize <= 0 or self._queue.qsize() + self._reserved < self._queue.maxsize
+
+    def _enqueue(self, job_id: str):
+        self._queue.put_nowait(job_id)
+        self._pending.add(job_id)
+
+    async def submit(self, payload: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+        # Reserve the slot before awaiting, so concurrent submits cannot overfill the queue
+        if not self._has_room():
+            raise JobQueueFull("Matching job queue is full")
+        self._reserved += 1
+        try:
+            job = {
+                "id": await self.next_id(),
+                "user_id": user_id,
+                "status": "queued",
+                "payload": payload,
+                "result": None,
+                "error": None,
+                "created_at": datetime.now(timezone.utc),
+                "started_at": None,
+                "finished_at": None,
+            }
+            await self.collection.insert_one(dict(job))
+        finally:
+            self._reserved -= 1
+        self._enqueue(job["id"])
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"id": job_id}, {"_id": 0})
+
+    async def list(self, user_id: Optional[str] = None, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {}
+        if user_id is not None:
+            query["user_id"] = user_id
+        if status is not None:
+            query["status"] = status
+        cursor = self.collection.find(query, {"_id": 0, "result": 0}).sort("created_at", -1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def _heartbeat(self, job_id: str, run_id: str):
+        while True:
+            await asyncio.sleep(self.stale_after / 3)
+            try:
+                await self.collection.update_one(
+                    {"id": job_id, "run_id": run_id}, {"$set": {"heartbeat_at": datetime.now(timezone.utc)}}
+                )
+            except Exception as e:
+                print(f"[DEBUG] Matching job {job_id} heartbeat failed: {str(e)}")
+
+    async def _run_job(self, job_id: str):
+        # Identifies this run, so a run that was declared stale cannot overwrite a newer one
+        run_id = uuid.uuid4().hex
+        now = datetime.now(timezone.utc)
+        job = await self.collection.find_one_and_update(
+            {"id": job_id, "status": "queued"},
+            {"$set": {"status": "running", "run_id": run_id, "started_at": now, "heartbeat_at": now}},
+        )
+        if job is None:
+            return
+        created_at = job["created_at"]
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        self._wait_times.append((datetime.now(timezone.utc) - created_at).total_seconds())
+
+        self.running += 1
+        start = time.perf_counter()
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, run_id))
+        try:
+            result = await self.runner(job["payload"])
+            update = {"status": "done", "result": result}
+            self.completed += 1
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back rather than leave it "running" until it goes stale
+            await self.collection.update_one(
+                {"id": job_id, "run_id": run_id},
+                {"$set": {"status": "queued", "run_id": None, "started_at": None, "heartbeat_at": None}},
+            )
+            raise
+        except Exception as e:
+            update = {"status": "failed", "error": str(e)}
+            self.failed += 1
+        finally:
+            heartbeat.cancel()
+            self.running -= 1
+            self._run_times.append(time.perf_counter() - start)
+        update["finished_at"] = datetime.now(timezone.utc)
+        await self.collection.update_one({"id": job_id, "status": "running", "run_id": run_id}, {"$set": update})
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            self._pending.discard(job_id)
+            try:
+                await self._run_job(job_id)
+            except Exception as e:
+                print(f"[DEBUG] Matching job {job_id} could not be processed: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def recover(self) -> int:
+        """Reset running jobs with a stale heartbeat to queued, then queue waiting jobs; returns how many were queued here."""
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=self.stale_after)
+        reset = await self.collection.update_many(
+            {"status": "running", "$or": [
+                {"heartbeat_at": {"$lt": stale_before}},
+                # Jobs claimed before heartbeats were recorded
+                {"heartbeat_at": {"$exists": False}, "started_at": {"$lt": stale_before}},
+            ]},
+            {"$set": {"status": "queued", "run_id": None, "started_at": None, "heartbeat_at": None}},
+        )
+        cursor = self.collection.find({"status": "queued"}, {"_id": 0, "id": 1}).sort("created_at", 1)
+        recovered = 0
+        async for job in cursor:
+            if not self._has_room():
+                break
+            if job["id"] not in self._pending:
+                self._enqueue(job["id"])
+                recovered += 1
+        if reset.modified_count or recovered:
+            print(f"[DEBUG] Reset {reset.modified_count} stale matching jobs, queued {recovered}")
+        return recovered
+
+    async def _run_recovery(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.recover()
+            except Exception as e:
+                print(f"[DEBUG] Matching job recovery failed: {str(e)}")
+
+    async def start(self, recovery_interval: float = MATCHING_JOB_RECOVERY_INTERVAL):
+        await self.recover()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._run_recovery(recovery_interval)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def metrics(self) -> Dict[str, Any]:
+        def summary(values):
+            if not values:
+                return {"avg": 0.0, "max": 0.0}
+            return {"avg": sum(values) / len(values), "max": max(values)}
+
+        return {
+            "queue_depth": self._queue.qsize(),
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_seconds": summary(self._wait_times),
+            "run_seconds": summary(self._run_times),
+        }
@@ -0,0 +1,77 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    if isinstance(value, dict) and "$oid" in value:
+        return ObjectId(value["$oid"])
+    return value
+
+
+def encode_cursor(doc: Dict[str, Any], sort: List[Tuple[str, int]]) -> str:
+    """Opaque continuation token holding the sort key values of the last returned document."""
+    values = [_encode_value(doc.get(field)) for field, _ in sort]
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: List[Tuple[str, int]]) -> List[Any]:
+    """Inverse of encode_cursor; raises ValueError for a malformed token."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(sort):
+            raise ValueError("Invalid cursor")
+        return [_decode_value(v) for v in values]
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_filter(sort: List[Tuple[str, int]], values: List[Any]) -> Dict[str, Any]:
+    """
+    Mongo filter matching documents strictly after `values` in `sort` order,
+    e.g. for [(a, 1), (b, 1)]: a > va OR (a == va AND b > vb).
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        clause[field] = {"$gt" if direction == ASCENDING else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def keyset_query(base_filter: Dict[str, Any], sort: List[Tuple[str, int]], cursor: Optional[str]) -> Dict[str, Any]:
+    if not cursor:
+        return base_filter
+    after = keyset_filter(sort, decode_cursor(cursor, sort))
+    return {"$and": [base_filter, after]} if base_filter else after
+
+
+async def fetch_page(collection, base_filter: Dict[str, Any], sort: List[Tuple[str, int]], cursor: Optional[str],
+                     limit: int, projection: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of a keyset-paginated query. Returns the documents and the
+    cursor for the next page (None on the last page).
+    """
+    query = keyset_query(base_filter, sort, cursor)
+    docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort)
+    return docs, next_cursor
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+
+MIN_ROUNDS = 4
+MAX_ROUNDS = 16
+
+
+class PasswordQueueFull(Exception):
+    """Raised when too many password operations are already waiting."""
+
+
+def hash_cost(hashed_password: str) -> Optional[int]:
+    """Return the cost factor of a bcrypt hash like "$2b$12$...", or None if it cannot be read."""
+    parts = hashed_password.split("$")
+    if len(parts) < 4:
+        return None
+    try:
+        return int(parts[2])
+    except ValueError:
+        return None
+
+
+def calibrate_rounds(target_ms: float, min_rounds: int = 10, max_rounds: int = MAX_ROUNDS) -> int:
+    """
+    Pick the highest bcrypt cost whose hash time stays at or below target_ms
+    on this machine (never below min_rounds). Each extra round doubles the
+    time, so we measure once and extrapolate.
+    """
+    probe_rounds = MIN_ROUNDS + 4
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration-probe", bcrypt.gensalt(rounds=probe_rounds))
+    probe_ms = (time.perf_counter() - start) * 1000
+
+    rounds = probe_rounds
+    while rounds < max_rounds and probe_ms * (2 ** (rounds + 1 - probe_rounds)) <= target_ms:
+        rounds += 1
+    return max(min_rounds, min(rounds, max_rounds))
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated thread pool so hashing never blocks the event
+    loop. bcrypt releases the GIL, so threads give real parallelism.
+
+    `max_concurrency` caps how many hashes run at once and `max_queue` caps
+    how many more may wait; beyond that PasswordQueueFull is raised.
+    """
+
+    def __init__(self, rounds: int = 12, max_concurrency: int = 4, max_queue: int = 64):
+        self.rounds = rounds
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="bcrypt")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+
+    async def _run(self, fn, *args):
+        if self._waiting >= self.max_concurrency + self.max_queue:
+            raise PasswordQueueFull("Too many password operations in progress")
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._waiting += 1
+        try:
+            async with self._semaphore:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self._waiting -= 1
+
+    def _hash_sync(self, password: str, rounds: int) -> str:
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+
+    @staticmethod
+    def _verify_sync(plain_password: str, hashed_password: str) -> bool:
+        return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._hash_sync, password, self.rounds)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(self._verify_sync, plain_password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """True when the stored hash uses a lower cost than the current setting."""
+        cost = hash_cost(hashed_password)
+        return cost is not None and cost < self.rounds
+
+    async def calibrate(self, target_ms: float):
+        """Set `rounds` from a measurement taken off the event loop."""
+        loop = asyncio.get_running_loop()
+        self.rounds = await loop.run_in_executor(self._executor, calibrate_rounds, target_ms)
+        print(f"[DEBUG] bcrypt cost calibrated to {self.rounds} rounds (target {target_ms} ms)")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def hasher_from_env() -> PasswordHasher:
+    """
+    BCRYPT_ROUNDS fixes the cost; otherwise it is calibrated at startup to
+    BCRYPT_TARGET_MS. BCRYPT_MAX_CONCURRENCY and BCRYPT_MAX_QUEUE size the pool.
+    """
+    return PasswordHasher(
+        rounds=int(os.environ.get("BCRYPT_ROUNDS", "12")),
+        max_concurrency=int(os.environ.get("BCRYPT_MAX_CONCURRENCY", str(min(4, os.cpu_count() or 1)))),
+        max_queue=int(os.environ.get("BCRYPT_MAX_QUEUE", "64")),
+    )
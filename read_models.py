@@ -0,0 +1,78 @@
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+
+@lru_cache(maxsize=None)
+def _projection(model: Type[BaseModel], extra: Tuple[str, ...]) -> Dict[str, int]:
+    projection = {name: 1 for name in model.model_fields}
+    for name in extra:
+        projection[name] = 1
+    projection.setdefault("_id", 0)
+    return projection
+
+
+def model_projection(model: Type[BaseModel], *extra: str) -> Dict[str, int]:
+    """
+    Mongo projection fetching only the fields `model` returns (plus `extra`,
+    e.g. a sort key), so `_id`, password hashes and other internal fields
+    never leave the database.
+    """
+    return _projection(model, extra)
+
+
+@lru_cache(maxsize=None)
+def _defaults(model: Type[BaseModel]) -> Dict[str, Any]:
+    return {
+        name: field.get_default(call_default_factory=True)
+        for name, field in model.model_fields.items()
+        if not field.is_required()
+    }
+
+
+def dump_rows(model: Type[BaseModel], docs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Shape trusted database rows like `model` would (missing optional fields
+    get their defaults, nothing outside the model is kept) without running
+    Pydantic validation on every row.
+    """
+    fields = model.model_fields
+    defaults = _defaults(model)
+    rows = []
+    for doc in docs:
+        row = {key: value for key, value in doc.items() if key in fields}
+        for name, default in defaults.items():
+            if name not in row:
+                row[name] = default
+        rows.append(row)
+    return rows
+
+
+def _default(value: Any):
+    return str(value)
+
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """JSON response encoded with orjson; returning a Response skips response_model re-validation."""
+    return Response(
+        content=orjson.dumps(content, default=_default),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+async def find_many(collection, model: Type[BaseModel], query: Dict[str, Any], limit: int = 100,
+                    sort: Optional[List[Tuple[str, int]]] = None) -> List[Dict[str, Any]]:
+    cursor = collection.find(query, model_projection(model))
+    if sort:
+        cursor = cursor.sort(sort)
+    return dump_rows(model, await cursor.to_list(length=limit))
+
+
+async def find_one(collection, model: Type[BaseModel], query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    doc = await collection.find_one(query, model_projection(model))
+    return None if doc is None else dump_rows(model, [doc])[0]
@@ -0,0 +1,57 @@
+import asyncio
+import os
+from typing import Dict, List
+
+from pymongo import UpdateMany
+
+
+BACKFILL_BATCH_SIZE = 500
+
+
+async def backfill_request_owners(db, batch_size: int = BACKFILL_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Migration step: copy each listing's `supermarket_id` onto the requests
+    made for it, so the supermarket inbox is one indexed query. Only requests
+    still missing the field are touched, so it is idempotent. Requests whose
+    listing is gone or has no owner are left as they are and counted.
+    """
+    listings = db.get_collection("listings")
+    requests = db.get_collection("requests")
+
+    pipeline = [
+        {"$match": {"supermarket_id": {"$exists": False}}},
+        {"$group": {"_id": "$listing_id"}},
+    ]
+    listing_ids: List[str] = [doc["_id"] async for doc in requests.aggregate(pipeline)]
+
+    updated = 0
+    orphaned = 0
+    for start in range(0, len(listing_ids), batch_size):
+        batch = listing_ids[start:start + batch_size]
+        owners = {}
+        cursor = listings.find({"id": {"$in": batch}}, {"_id": 0, "id": 1, "supermarket_id": 1})
+        async for listing in cursor:
+            if listing.get("supermarket_id"):
+                owners[listing["id"]] = listing["supermarket_id"]
+        orphaned += len(batch) - len(owners)
+        if not owners:
+            continue
+        operations = [
+            UpdateMany({"listing_id": listing_id, "supermarket_id": {"$exists": False}},
+                       {"$set": {"supermarket_id": owner}})
+            for listing_id, owner in owners.items()
+        ]
+        result = await requests.bulk_write(operations, ordered=False)
+        updated += result.modified_count
+
+    if updated or orphaned:
+        print(f"[DEBUG] Backfilled supermarket_id on {updated} requests ({orphaned} listings without an owner)")
+    return {"updated": updated, "listings_without_owner": orphaned}
+
+
+if __name__ == "__main__":
+    import motor.motor_asyncio
+
+    mongo_uri = os.environ.get("MONGO_DETAILS", "mongodb://localhost:27017")
+    mongo_client = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri)
+    print(asyncio.run(backfill_request_owners(mongo_client.inventory_app)))
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+SCHEMA_CACHE_DIR = os.environ.get("SCHEMA_CACHE_DIR", ".schema_cache")
+CACHE_FORMAT_VERSION = 1
+
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def snapshot_key(xml_path: str, xsd_path: str) -> str:
+    """Cache key built from the content hashes of schema.xml and the XSD."""
+    combined = f"{CACHE_FORMAT_VERSION}:{file_digest(xml_path)}:{file_digest(xsd_path)}"
+    return hashlib.sha256(combined.encode("utf-8")).hexdigest()
+
+
+def _write_atomic(path: str, payload: Dict[str, Any]):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_schema_snapshot(
+    xml_path: str,
+    xsd_path: str,
+    build: Callable[[str, str], Dict[str, Any]],
+    cache_dir: str = SCHEMA_CACHE_DIR,
+) -> Dict[str, Any]:
+    """
+    Return the loaded schema for the current schema.xml / XSD pair.
+
+    The result of `build(xml_path, xsd_path)` (XSD validation plus parsing) is
+    stored in `cache_dir` under the combined content hash, so later worker
+    starts with unchanged files just read one small JSON file.
+    """
+    key = snapshot_key(xml_path, xsd_path)
+    cache_path = os.path.join(cache_dir, f"schema-{key}.json")
+    try:
+        with open(cache_path) as f:
+            snapshot = json.load(f)
+        print(f"[DEBUG] Loaded schema snapshot from cache: {cache_path}")
+        return snapshot["schema"]
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    schema = build(xml_path, xsd_path)
+    try:
+        _write_atomic(cache_path, {"key": key, "schema": schema})
+    except OSError as e:
+        print(f"[DEBUG] Could not write schema cache '{cache_path}': {str(e)}")
+    return schema
+
+
+class SchemaWatcher:
+    """
+    Opt-in background thread that polls schema.xml and the XSD and calls
+    `on_change(schema)` with a freshly built snapshot when either changes.
+    A file that fails to build keeps the previous schema in place.
+    """
+
+    def __init__(
+        self,
+        xml_path: str,
+        xsd_path: str,
+        build: Callable[[str, str], Dict[str, Any]],
+        on_change: Callable[[Dict[str, Any]], None],
+        interval: float = 2.0,
+        cache_dir: str = SCHEMA_CACHE_DIR,
+    ):
+        self.xml_path = xml_path
+        self.xsd_path = xsd_path
+        self.build = build
+        self.on_change = on_change
+        self.interval = interval
+        self.cache_dir = cache_dir
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_key = self._current_key()
+
+    def _current_key(self) -> Optional[str]:
+        try:
+            return snapshot_key(self.xml_path, self.xsd_path)
+        except OSError:
+            return None
+
+    def check(self) -> bool:
+        """Reload once if the files changed; returns True when a new schema was applied."""
+        key = self._current_key()
+        if key is None or key == self._last_key:
+            return False
+        try:
+            schema = load_schema_snapshot(self.xml_path, self.xsd_path, self.build, self.cache_dir)
+            self.on_change(schema)
+        except Exception as e:
+            print(f"[DEBUG] Schema reload failed, keeping previous schema: {str(e)}")
+            return False
+        finally:
+            self._last_key = key
+        print("[DEBUG] Schema reloaded from", self.xml_path)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="schema-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
@@ -0,0 +1,97 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+# Python types accepted for each schema.xml field type (same rules as check_type)
+TYPE_MAP = {
+    "string": str,
+    "integer": int,
+    "float": float,
+    "boolean": bool,
+    "datetime": datetime,
+}
+
+
+class CompiledValidator:
+    """
+    Validator for one collection, node or relationship, built once from the
+    loaded schema. Calling it checks a whole document in a single pass.
+    """
+
+    __slots__ = ("label", "field_types", "expected_names", "quote")
+
+    def __init__(self, label: str, fields: Dict[str, str], quote: bool = True):
+        self.label = label
+        self.field_types = {}
+        self.expected_names = {}
+        for field_name, field_type in fields.items():
+            if field_type not in TYPE_MAP:
+                raise ValueError(f"Unknown type {field_type}")
+            self.field_types[field_name] = TYPE_MAP[field_type]
+            self.expected_names[field_name] = field_type
+        self.quote = quote
+
+    def __call__(self, data: Dict[str, Any]) -> bool:
+        field_types = self.field_types
+        for key, value in data.items():
+            expected = field_types.get(key)
+            if expected is None:
+                raise ValueError(f"Invalid field '{key}' for {self.label}.")
+            if not isinstance(value, expected):
+                expected_name = self.expected_names[key]
+                got_name = type(value).__name__
+                if self.quote:
+                    expected_name, got_name = f"'{expected_name}'", f"'{got_name}'"
+                raise TypeError(f"Incorrect type for '{key}'. Expected {expected_name}, got {got_name}.")
+        return True
+
+    def validate_many(self, docs: Iterable[Dict[str, Any]]) -> List[Tuple[int, Exception]]:
+        """Validate a batch of documents and return (index, error) for every invalid one."""
+        errors = []
+        for index, doc in enumerate(docs):
+            try:
+                self(doc)
+            except (ValueError, TypeError) as e:
+                errors.append((index, e))
+        return errors
+
+
+class CompiledSchema:
+    """Per-collection and per-node validators compiled from a load_schema() result."""
+
+    def __init__(self, schema: Dict[str, Any], mongo_db: str = "inventory_app", neo4j_db: str = "cities_db"):
+        self.mongo_db = mongo_db
+        self.neo4j_db = neo4j_db
+        self.mongo: Dict[str, CompiledValidator] = {}
+        self.neo4j: Dict[Tuple[str, str], CompiledValidator] = {}
+
+        collections = schema.get("MongoDB", {}).get(mongo_db, {})
+        for collection_name, fields in collections.items():
+            self.mongo[collection_name] = CompiledValidator(f"collection '{collection_name}'", fields)
+
+        self.has_neo4j = neo4j_db in schema
+        self.neo4j_kinds = set(schema.get(neo4j_db, {}))
+        for node_or_rel, entities in schema.get(neo4j_db, {}).items():
+            for entity_type, fields in entities.items():
+                self.neo4j[(node_or_rel, entity_type)] = CompiledValidator(entity_type, fields, quote=False)
+
+    def mongo_validator(self, collection_name: str) -> CompiledValidator:
+        validator = self.mongo.get(collection_name)
+        if validator is None:
+            raise ValueError(f"Collection '{collection_name}' is not defined in the schema for database '{self.mongo_db}'.")
+        return validator
+
+    def neo4j_validator(self, node_or_rel: str, entity_type: str) -> CompiledValidator:
+        validator = self.neo4j.get((node_or_rel, entity_type))
+        if validator is None:
+            if not self.has_neo4j:
+                raise ValueError("Neo4j database not defined in schema.")
+            if node_or_rel not in self.neo4j_kinds:
+                raise ValueError(f"{node_or_rel} is not defined in Neo4j schema.")
+            raise ValueError(f"{entity_type} is not defined in Neo4j schema.")
+        return validator
+
+
+def compile_schema(schema: Dict[str, Any]) -> CompiledSchema:
+    """Compile a load_schema() result into validator objects."""
+    return CompiledSchema(schema)
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+
+STATS_CACHE_TTL = float(os.environ.get("STATS_CACHE_TTL", "10"))
+STATS_RECONCILE_INTERVAL = float(os.environ.get("STATS_RECONCILE_INTERVAL", "600"))
+
+STATS_DOC_ID = "totals"
+
+
+def _key(value: Any) -> str:
+    """Breakdown values become field names, so keep them free of '.' and a leading '$'."""
+    if value is None or value == "":
+        return "unknown"
+    text = str(value).replace(".", "_")
+    return "_" + text[1:] if text.startswith("$") else text
+
+
+def expiry_day(expiry_date: Any) -> str:
+    if not isinstance(expiry_date, datetime):
+        return "unknown"
+    if expiry_date.tzinfo is not None:
+        expiry_date = expiry_date.astimezone(timezone.utc)
+    return expiry_date.strftime("%Y-%m-%d")
+
+
+def user_delta(user: Dict[str, Any], sign: int = 1) -> Dict[str, int]:
+    return {"users.total": sign, f"users.by_role.{_key(user.get('role'))}": sign}
+
+
+def listing_delta(listing: Dict[str, Any], sign: int = 1) -> Dict[str, int]:
+    return {
+        "listings.total": sign,
+        f"listings.by_category.{_key(listing.get('category'))}": sign,
+        f"listings.by_location.{_key(listing.get('location'))}": sign,
+        f"listings.by_expiry_day.{expiry_day(listing.get('expiry_date'))}": sign,
+    }
+
+
+def request_delta(request: Dict[str, Any], sign: int = 1) -> Dict[str, int]:
+    return {"requests.total": sign, f"requests.by_status.{_key(request.get('status'))}": sign}
+
+
+def change_delta(delta_fn, before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, int]:
+    """Delta for a document that changed from `before` to `after` (zero entries dropped)."""
+    return merge_deltas([delta_fn(before, -1), delta_fn(after, 1)])
+
+
+def merge_deltas(deltas) -> Dict[str, int]:
+    """Sum several deltas into one, so a bulk write costs a single $inc."""
+    combined: Dict[str, int] = {}
+    for delta in deltas:
+        for path, n in delta.items():
+            combined[path] = combined.get(path, 0) + n
+    return {path: n for path, n in combined.items() if n}
+
+
+def expiry_buckets(by_day: Dict[str, int], today: Optional[date] = None) -> Dict[str, int]:
+    """Fold per-day listing counts into buckets relative to today (UTC)."""
+    today = today or datetime.now(timezone.utc).date()
+    week_end = (today + timedelta(days=7)).isoformat()
+    today_key = today.isoformat()
+    buckets = {"expired": 0, "today": 0, "next_7_days": 0, "later": 0, "unknown": 0}
+    for day, n in by_day.items():
+        if day == "unknown":
+            bucket = "unknown"
+        elif day < today_key:
+            bucket = "expired"
+        elif day == today_key:
+            bucket = "today"
+        elif day <= week_end:
+            bucket = "next_7_days"
+        else:
+            bucket = "later"
+        buckets[bucket] += n
+    return buckets
+
+
+def _breakdown(rows) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for row in rows:
+        key = _key(row["_id"])
+        counts[key] = counts.get(key, 0) + row["n"]
+    return counts
+
+
+class StatsStore:
+    """
+    Dashboard totals and breakdowns kept in one materialized document.
+
+    Writes apply small `$inc` deltas to the document; a periodic reconcile
+    recomputes everything with a single aggregation and replaces it, so any
+    drift (failed writes, direct database edits) is bounded by the interval.
+    Reads are served from memory for `ttl` seconds.
+    """
+
+    def __init__(self, db, collection_name: str = "stats", ttl: float = STATS_CACHE_TTL):
+        self.db = db
+        self.collection = db.get_collection(collection_name)
+        self.ttl = ttl
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._loaded_at = 0.0
+
+    async def record(self, delta: Dict[str, int]):
+        if not delta:
+            return
+        try:
+            await self.collection.update_one({"_id": STATS_DOC_ID}, {"$inc": delta}, upsert=True)
+        except Exception as e:
+            # The next reconcile repairs the totals; a stats failure must not fail the write
+            print(f"[DEBUG] Stats update failed: {str(e)}")
+
+    async def reconcile(self) -> Dict[str, Any]:
+        """Recompute every counter from the source collections in one pipeline."""
+        pipeline = [
+            {"$project": {"_id": 0, "_c": "users", "role": 1}},
+            {"$unionWith": {"coll": "listings", "pipeline": [{"$project": {
+                "_id": 0, "_c": "listings", "category": 1, "location": 1,
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$expiry_date", "onNull": "unknown"}},
+            }}]}},
+            {"$unionWith": {"coll": "requests", "pipeline": [{"$project": {"_id": 0, "_c": "requests", "status": 1}}]}},
+            {"$facet": {
+                "users_by_role": [{"$match": {"_c": "users"}}, {"$group": {"_id": "$role", "n": {"$sum": 1}}}],
+                "listings_by_category": [{"$match": {"_c": "listings"}}, {"$group": {"_id": "$category", "n": {"$sum": 1}}}],
+                "listings_by_location": [{"$match": {"_c": "listings"}}, {"$group": {"_id": "$location", "n": {"$sum": 1}}}],
+                "listings_by_expiry_day": [{"$match": {"_c": "listings"}}, {"$group": {"_id": "$day", "n": {"$sum": 1}}}],
+                "requests_by_status": [{"$match": {"_c": "requests"}}, {"$group": {"_id": "$status", "n": {"$sum": 1}}}],
+            }},
+        ]
+        result = await self.db.get_collection("users").aggregate(pipeline).to_list(length=1)
+        facets = result[0] if result else {}
+
+        by_role = _breakdown(facets.get("users_by_role", []))
+        by_category = _breakdown(facets.get("listings_by_category", []))
+        by_status = _breakdown(facets.get("requests_by_status", []))
+        doc = {
+            "users": {"total": sum(by_role.values()), "by_role": by_role},
+            "listings": {
+                "total": sum(by_category.values()),
+                "by_category": by_category,
+                "by_location": _breakdown(facets.get("listings_by_location", [])),
+                "by_expiry_day": _breakdown(facets.get("listings_by_expiry_day", [])),
+            },
+            "requests": {"total": sum(by_status.values()), "by_status": by_status},
+            "reconciled_at": datetime.now(timezone.utc),
+        }
+        await self.collection.replace_one({"_id": STATS_DOC_ID}, doc, upsert=True)
+        self._snapshot = doc
+        self._loaded_at = time.monotonic()
+        return doc
+
+    async def get(self) -> Dict[str, Any]:
+        """Stats for the dashboard; at most `ttl` seconds old."""
+        if self._snapshot is None or time.monotonic() - self._loaded_at > self.ttl:
+            doc = await self.collection.find_one({"_id": STATS_DOC_ID})
+            if doc is None:
+                doc = await self.reconcile()
+            self._snapshot = doc
+            self._loaded_at = time.monotonic()
+        doc = self._snapshot
+        users = doc.get("users", {})
+        listings = doc.get("listings", {})
+        requests = doc.get("requests", {})
+        return {
+            "user_count": users.get("total", 0),
+            "listing_count": listings.get("total", 0),
+            "request_count": requests.get("total", 0),
+            "users_by_role": {k: n for k, n in users.get("by_role", {}).items() if n},
+            "requests_by_status": {k: n for k, n in requests.get("by_status", {}).items() if n},
+            "listings_by_category": {k: n for k, n in listings.get("by_category", {}).items() if n},
+            "listings_by_location": {k: n for k, n in listings.get("by_location", {}).items() if n},
+            "listings_by_expiry": expiry_buckets(listings.get("by_expiry_day", {})),
+            "reconciled_at": doc.get("reconciled_at"),
+        }
+
+    async def run_reconciliation(self, interval: float = STATS_RECONCILE_INTERVAL):
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                print(f"[DEBUG] Stats reconcile failed: {str(e)}")
+            await asyncio.sleep(interval)
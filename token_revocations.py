@@ -0,0 +1,72 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+
+TOKEN_REVOCATION_REFRESH = float(os.environ.get("TOKEN_REVOCATION_REFRESH", "30"))
+
+
+class TokenRevocations:
+    """
+    Minimum accepted token version for users whose tokens were revoked
+    recently (password, role or location change, or an explicit revoke).
+
+    Every user's tokens carry the user's `token_version` when issued;
+    revoking bumps that version and records it here. Entries are only
+    needed until the last token issued before the bump has expired, so the
+    set stays small. It is kept in memory and reloaded from the
+    `token_revocations` collection every `interval` seconds, which is how
+    revocations made by other workers arrive. A reload merges into the
+    local set (keeping the higher version) and only drops expired entries,
+    so a local revoke made during the reload is never undone.
+    """
+
+    def __init__(self, collection, token_lifetime: timedelta):
+        self.collection = collection
+        self.token_lifetime = token_lifetime
+        self._min_versions: Dict[str, int] = {}
+        self._expires_at: Dict[str, datetime] = {}
+        self.checks_failed = 0
+
+    def is_current(self, user_id: str, version: int) -> bool:
+        if version >= self._min_versions.get(user_id, 0):
+            return True
+        self.checks_failed += 1
+        return False
+
+    async def revoke(self, user_id: str, min_version: int):
+        """Reject this user's tokens older than `min_version` from now on."""
+        expires_at = datetime.now(timezone.utc) + self.token_lifetime
+        await self.collection.update_one(
+            {"_id": user_id},
+            {"$max": {"min_version": min_version}, "$set": {"expires_at": expires_at}},
+            upsert=True,
+        )
+        self._merge(user_id, min_version, expires_at)
+
+    def _merge(self, user_id: str, min_version: int, expires_at: datetime):
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        self._min_versions[user_id] = max(self._min_versions.get(user_id, 0), min_version)
+        self._expires_at[user_id] = max(self._expires_at.get(user_id, expires_at), expires_at)
+
+    async def refresh(self):
+        now = datetime.now(timezone.utc)
+        await self.collection.delete_many({"expires_at": {"$lt": now}})
+        async for doc in self.collection.find({}, {"min_version": 1, "expires_at": 1}):
+            self._merge(doc["_id"], doc["min_version"], doc["expires_at"])
+        for user_id in [u for u, expires_at in self._expires_at.items() if expires_at < now]:
+            del self._expires_at[user_id]
+            del self._min_versions[user_id]
+
+    async def run_refresh(self, interval: float = TOKEN_REVOCATION_REFRESH):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"[DEBUG] Token revocation refresh failed: {str(e)}")
+            await asyncio.sleep(interval)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"revoked_users": len(self._min_versions), "checks_failed": self.checks_failed}
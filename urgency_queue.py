@@ -0,0 +1,168 @@
+import asyncio
+import heapq
+import os
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from pymongo import ASCENDING
+
+
+# Background matching of the most urgent listings (off by default: it spends LLM calls)
+URGENT_AUTO_MATCH = os.environ.get("URGENT_AUTO_MATCH", "0") == "1"
+URGENT_AUTO_MATCH_INTERVAL = float(os.environ.get("URGENT_AUTO_MATCH_INTERVAL", "600"))
+URGENT_AUTO_MATCH_COUNT = int(os.environ.get("URGENT_AUTO_MATCH_COUNT", "20"))
+# How often the queue is reloaded from Mongo, which is how other workers' writes arrive
+URGENCY_QUEUE_REFRESH = float(os.environ.get("URGENCY_QUEUE_REFRESH", "60"))
+
+
+def _timestamp(expiry_date: Any) -> Optional[float]:
+    if not isinstance(expiry_date, datetime):
+        return None
+    if expiry_date.tzinfo is None:
+        expiry_date = expiry_date.replace(tzinfo=timezone.utc)
+    return expiry_date.timestamp()
+
+
+class UrgencyQueue:
+    """
+    Unmatched listings ordered by expiry, soonest first.
+
+    A binary heap of (expiry timestamp, listing id) with lazy deletion: an
+    update pushes a new entry and a removal only forgets the id, so both are
+    O(log n); stale heap entries are skipped when they surface and the heap
+    is rebuilt once they outnumber live ones. `most_urgent(n)` pops the
+    first n live entries and pushes them back, O(n log size).
+
+    A listing counts as matched while one of its requests is approved.
+
+    Writes in this process update the queue directly; writes made by other
+    workers arrive when `run_refresh` reloads it. Updates that land while a
+    reload is reading Mongo are recorded and replayed on the new snapshot.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._expiry: Dict[str, float] = {}
+        self.matched: Set[str] = set()
+        # Updates made during a rebuild, replayed once the rebuild's snapshot is swapped in
+        self._journal: Optional[List[Tuple[Callable, tuple]]] = None
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def _compact(self):
+        self._heap = [(ts, listing_id) for listing_id, ts in self._expiry.items()]
+        heapq.heapify(self._heap)
+
+    def _record(self, method: Callable, *args) -> None:
+        if self._journal is not None:
+            self._journal.append((method, args))
+
+    def upsert(self, listing: Dict[str, Any]):
+        """Add or re-key a listing after it is created or updated."""
+        self._record(UrgencyQueue.upsert, listing)
+        listing_id = listing["id"]
+        ts = _timestamp(listing.get("expiry_date"))
+        if ts is None or listing_id in self.matched:
+            self._expiry.pop(listing_id, None)
+            return
+        if self._expiry.get(listing_id) == ts:
+            return
+        self._expiry[listing_id] = ts
+        heapq.heappush(self._heap, (ts, listing_id))
+        if len(self._heap) > 2 * len(self._expiry) + 64:
+            self._compact()
+
+    def remove(self, listing_id: str):
+        """Forget a listing that was deleted or archived."""
+        self._record(UrgencyQueue.remove, listing_id)
+        self._expiry.pop(listing_id, None)
+        self.matched.discard(listing_id)
+
+    def mark_matched(self, listing_id: str):
+        self._record(UrgencyQueue.mark_matched, listing_id)
+        self.matched.add(listing_id)
+        self._expiry.pop(listing_id, None)
+
+    def unmark_matched(self, listing: Dict[str, Any]):
+        """Put a listing back after its last approved request was changed to another status."""
+        self._record(UrgencyQueue.unmark_matched, listing)
+        self.matched.discard(listing["id"])
+        self.upsert(listing)
+
+    def most_urgent(self, n: int, now: Optional[datetime] = None) -> List[Tuple[str, float]]:
+        """
+        Up to n (listing id, expiry timestamp) pairs, soonest expiry first.
+        Listings that have already expired are dropped from the queue.
+        """
+        now_ts = (now or datetime.now(timezone.utc)).timestamp()
+        taken: List[Tuple[float, str]] = []
+        while self._heap and len(taken) < n:
+            ts, listing_id = heapq.heappop(self._heap)
+            if self._expiry.get(listing_id) != ts:
+                continue  # removed or re-keyed since this entry was pushed
+            if ts < now_ts:
+                del self._expiry[listing_id]
+                continue
+            taken.append((ts, listing_id))
+        for entry in taken:
+            heapq.heappush(self._heap, entry)
+        return [(listing_id, ts) for ts, listing_id in taken]
+
+    async def rebuild(self, listings, requests, now: Optional[datetime] = None):
+        """Load unexpired, unmatched listings with one indexed query each."""
+        now = now or datetime.now(timezone.utc)
+        self._journal = []
+        try:
+            matched = set(await requests.distinct("listing_id", {"status": "approved"}))
+            expiry: Dict[str, float] = {}
+            cursor = listings.find({"expiry_date": {"$gte": now}}, {"_id": 0, "id": 1, "expiry_date": 1})
+            async for listing in cursor.sort([("expiry_date", ASCENDING), ("id", ASCENDING)]):
+                ts = _timestamp(listing.get("expiry_date"))
+                if ts is not None and listing["id"] not in matched:
+                    expiry[listing["id"]] = ts
+        except BaseException:
+            self._journal = None
+            raise
+        journal, self._journal = self._journal, None
+        self.matched = matched
+        self._expiry = expiry
+        self._compact()
+        for method, args in journal:
+            method(self, *args)
+        return len(expiry)
+
+    async def run_refresh(self, listings, requests, interval: float = URGENCY_QUEUE_REFRESH):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.rebuild(listings, requests)
+            except Exception as e:
+                print(f"[DEBUG] Urgency queue refresh failed: {str(e)}")
+
+    async def run_auto_matching(
+        self,
+        submit: Callable[[List[str]], Awaitable[Any]],
+        interval: float = URGENT_AUTO_MATCH_INTERVAL,
+        count: int = URGENT_AUTO_MATCH_COUNT,
+    ):
+        """
+        Every `interval` seconds, hand the `count` most urgent listings to
+        `submit` (e.g. the matching job queue). A listing still in the
+        queue with the same expiry is not submitted twice.
+        """
+        submitted: Dict[str, float] = {}
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                urgent = self.most_urgent(count)
+                listing_ids = [listing_id for listing_id, ts in urgent if submitted.get(listing_id) != ts]
+                if listing_ids:
+                    await submit(listing_ids)
+                    submitted.update(urgent)
+                submitted = {i: ts for i, ts in submitted.items() if self._expiry.get(i) == ts}
+            except Exception as e:
+                print(f"[DEBUG] Urgent auto-matching failed: {str(e)}")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"listings": len(self._expiry), "heap_entries": len(self._heap), "matched": len(self.matched)}